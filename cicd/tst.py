@@ -3,8 +3,12 @@ from langfuse.experiment import Evaluation
 import sys
 import os
 import json
+import time
+import asyncio
+import statistics
 import boto3
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils.langfuse import get_langfuse_client
@@ -12,8 +16,8 @@ from utils.agent import invoke_agent
 from utils.aws import get_ssm_parameter
 import logging
 
-# Simple EvaluationResult class
-@dataclass
+# Simple EvaluationResult class (slotted/frozen: no per-instance __dict__)
+@dataclass(slots=True, frozen=True)
 class EvaluationResult:
     name: str
     value: float
@@ -23,6 +27,12 @@ class EvaluationResult:
 #logging.basicConfig(level=logging.DEBUG)
 #logger = logging.getLogger("autoevals")
 #logger.setLevel(logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# EVAL_DEBUG=1 turns on the verbose per-item dumps (agent output, evaluations)
+DEBUG = os.getenv("EVAL_DEBUG") == "1"
+if DEBUG:
+    logger.setLevel(logging.DEBUG)
 
 
 
@@ -47,6 +57,17 @@ def load_hp_config(config_path="cicd/hp_config.json"):
         print(f"Error: Invalid JSON in {config_path}: {e}")
         sys.exit(1)
 
+# Batch trace uploads in the SDK's background exporter instead of pushing them
+# while items are still running; the single explicit flush happens at the end
+# of the script. Must be set before the client is created.
+os.environ.setdefault("LANGFUSE_FLUSH_AT", "100")
+os.environ.setdefault("LANGFUSE_FLUSH_INTERVAL", "5")
+
+# Start Langfuse client initialization (SSM lookups + client setup) in the
+# background so it overlaps config loading and dataset preparation
+_startup_pool = ThreadPoolExecutor(max_workers=1)
+_langfuse_future = _startup_pool.submit(get_langfuse_client)
+
 # Load configuration
 print("Loading agent configuration from hp_config.json...")
 config = load_hp_config()
@@ -62,8 +83,11 @@ print(f"Using agent ARN from deployment: {agent_arn}")
 print(f"Agent Name: {config.get('agent_name', 'N/A')}")
 print(f"Agent ID: {config.get('agent_id', 'N/A')}")
 
-    # Initialize Langfuse client
-langfuse = get_langfuse_client()
+# Concurrency cap for experiment items. Each item makes one AgentCore runtime
+# invocation that fans out to Bedrock model calls, so keep this below the
+# account's per-model TPS quota; the adaptive retry mode on the agent client
+# backs off automatically if the ceiling is still too high.
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "4"))
 
 # Note: Bedrock evaluation disabled - not accessible in channel program accounts
 # Using simple rule-based evaluator instead
@@ -103,10 +127,13 @@ for i, item in enumerate(items_list):
     print(f"  Expected Output: {item.expected_output}")
 print(f"{'='*80}\n")
 
+# Per-item agent latency in seconds, keyed by dataset item id
+item_latencies = {}
+
 # Define the task function that wraps invoke_agent
-def agent_task(*, item, **kwargs):
+def invoke_single_item(item):
     """
-    Task function that invokes the agent with the dataset item input.
+    Invoke the agent for one dataset item (blocking).
 
     Parameters:
     - item: DatasetItemClient object with input and expected_output
@@ -136,9 +163,12 @@ def agent_task(*, item, **kwargs):
             else:
                 raise
 
-        print(f"Agent result type: {type(result)}")
-        print(f"Agent result keys: {result.keys() if isinstance(result, dict) else 'N/A'}")
-        print(f"Full agent result: {result}")  # DEBUG: Print full result
+        # Verbose dumps only when DEBUG logging is on (f-strings are eager)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            print(f"Agent result type: {type(result)}")
+            print(f"Agent result keys: {result.keys() if isinstance(result, dict) else 'N/A'}")
+            print(f"Full agent result: {result}")
 
         # Check for errors
         if isinstance(result, dict) and 'error' in result:
@@ -160,16 +190,38 @@ def agent_task(*, item, **kwargs):
             # If result is already a string (plain response), use it directly
             response = str(result)
 
-        # DEBUG: Print full response details
-        print(f"Agent response length: {len(str(response))}")
-        print(f"Agent response (first 200 chars): {str(response)[:200]}")
-        print(f"Agent response (full): {response}")
+        response_text = str(response)
+        print(f"Agent response length: {len(response_text)}")
+        if debug:
+            print(f"Agent response (first 200 chars): {response_text[:200]}")
+            print(f"Agent response (full): {response_text}")
         return response
     except Exception as e:
         print(f"Error in agent_task: {str(e)}")
         raise
 
 
+async def agent_task(*, item, **kwargs):
+    """
+    Task function passed to run_experiment.
+
+    invoke_agent is a blocking boto3 call, so it runs in a worker thread; this
+    lets run_experiment overlap up to EVAL_WORKERS items instead of awaiting
+    them one by one. The Langfuse trace context is carried into the thread.
+
+    Parameters:
+    - item: DatasetItemClient object with input and expected_output
+
+    Returns:
+    - str: The agent's response
+    """
+    start = time.perf_counter()
+    try:
+        return await asyncio.to_thread(invoke_single_item, item)
+    finally:
+        item_latencies[item.id] = time.perf_counter() - start
+
+
 # Define simple rule-based evaluator (Bedrock not accessible in channel program accounts)
 def simple_quality_evaluator(*, input, output, expected_output, **kwargs):
     """Simple rule-based evaluator that checks if the agent responded successfully.
@@ -182,13 +234,16 @@ def simple_quality_evaluator(*, input, output, expected_output, **kwargs):
     Returns 0.0 otherwise.
     """
     try:
-        print(f"\n[EVALUATOR] Starting simple quality evaluation")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            print(f"\n[EVALUATOR] Starting simple quality evaluation")
 
         output_text = str(output)
 
-        # Check for errors
+        # Check for errors (lowercase the response once, not per indicator)
         error_indicators = ['error', 'failed', 'exception', 'not available']
-        has_error = any(indicator in output_text.lower() for indicator in error_indicators)
+        output_lower = output_text.lower()
+        has_error = any(indicator in output_lower for indicator in error_indicators)
 
         # Check if output is meaningful
         is_empty = len(output_text.strip()) < 10
@@ -212,7 +267,8 @@ def simple_quality_evaluator(*, input, output, expected_output, **kwargs):
             value=score,
             comment=comment
         )
-        print(f"[EVALUATOR] Returning Evaluation: {evaluation}")
+        if debug:
+            print(f"[EVALUATOR] Returning Evaluation: {evaluation}")
         return evaluation
     except Exception as e:
         print(f"[EVALUATOR] Error: {str(e)}")
@@ -226,11 +282,16 @@ print(f"{'='*80}\n")
 # Convert dataset items to list for experiment
 data = list(items_list)
 
+# Langfuse client was initialized in the background at startup
+langfuse = _langfuse_future.result()
+_startup_pool.shutdown()
+
 result = langfuse.run_experiment(
     name="SAP Inventory Agent - Simple Evaluation",
     data=data,
     task=agent_task,
-    evaluators=[simple_quality_evaluator]
+    evaluators=[simple_quality_evaluator],
+    max_concurrency=EVAL_WORKERS
 )
 
 # Print experiment summary
@@ -248,47 +309,64 @@ print(f"{'='*80}")
 # Process each item result
 for idx, item_result in enumerate(result.item_results or []):
     print(f"\nItem {idx+1}:")
-    print(f"  Output: {str(item_result.output)[:150]}...")
+    if DEBUG:
+        print(f"  Output: {str(item_result.output)[:150]}...")
 
     # Extract evaluations for this item
-    if item_result.evaluations:
-        for evaluation in item_result.evaluations:
-            print(f"  Evaluation: {evaluation}")
-
-            # Extract name and value from evaluation object
-            eval_name = getattr(evaluation, 'name', None)
-            eval_value = getattr(evaluation, 'value', None)
-            eval_comment = getattr(evaluation, 'comment', None)
-
-            if eval_name == 'simple_quality':
+    evaluations = item_result.evaluations
+    if evaluations:
+        for evaluation in evaluations:
+            if DEBUG:
+                print(f"  Evaluation: {evaluation}")
+
+            # Evaluation objects always carry name/value/comment; skip anything else
+            try:
+                if evaluation.name != 'simple_quality':
+                    continue
+                eval_value = evaluation.value
                 quality_scores.append({
-                    "name": eval_name,
+                    "name": evaluation.name,
                     "value": eval_value,
-                    "comment": eval_comment
+                    "comment": evaluation.comment
                 })
-                print(f"  ✓ Captured score: {eval_value}")
+            except AttributeError:
+                continue
+            print(f"  ✓ Captured score: {eval_value}")
     else:
         print(f"  (No evaluations)")
 
 print(f"\nTotal scores captured: {len(quality_scores)}")
 
-# Calculate average
-avg_score = sum(s['value'] for s in quality_scores) / len(quality_scores) if quality_scores else 0
+# Calculate summary statistics in one pass over the extracted values
+values = [s['value'] for s in quality_scores]
+avg_score = statistics.fmean(values) if values else 0
+p50_score = statistics.median(values) if values else 0
+std_score = statistics.pstdev(values) if values else 0
 
 # Save results
 results = {
     'experiment_name': result.name,
     'total_items': len(quality_scores),
     'average_quality_score': avg_score,
-    'scores': quality_scores
+    'median_quality_score': p50_score,
+    'stddev_quality_score': std_score,
+    'scores': quality_scores,
+    'item_latencies_seconds': item_latencies
 }
 
 with open('evaluation_results.json', 'w') as f:
     json.dump(results, f, indent=2)
 
+# Upload any buffered traces/scores once, after results are safely on disk
+langfuse.flush()
+
 print(f"\n{'='*80}")
 print(f"Evaluation Results Summary (Simple Rule-Based):")
 print(f"  Average Score: {avg_score:.3f} ({avg_score*100:.1f}%)")
+print(f"  Median Score: {p50_score:.3f} | Std Dev: {std_score:.3f}")
 print(f"  Total Items: {len(quality_scores)}")
+if item_latencies:
+    print(f"  Agent Latency: max {max(item_latencies.values()):.1f}s, "
+          f"sum {sum(item_latencies.values()):.1f}s across {len(item_latencies)} items")
 print(f"  Results saved to: evaluation_results.json")
 print(f"{'='*80}\n")
\ No newline at end of file
@@ -1,15 +1,47 @@
 import json
-import urllib.request
 import urllib.parse
-import urllib.error
 import base64
+import functools
+import hashlib
+import io
 import logging
+import random
 import re
 import ssl
 import time
-import xml.etree.ElementTree as ET
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
 
+import urllib3
+
+# lxml (C-accelerated iterparse) when the layer ships it, stdlib otherwise
+try:
+    from lxml import etree as _etree
+except ImportError:
+    import xml.etree.ElementTree as _etree
+
+# Fastest JSON codec available in the Lambda layer: orjson, then ujson, then the
+# stdlib. Both third-party codecs parse OData payloads several times faster.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj, indent=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+except ImportError:
+    try:
+        import ujson
+        _json_loads = ujson.loads
+
+        def _json_dumps(obj, indent=False):
+            return ujson.dumps(obj, indent=2 if indent else 0, escape_forward_slashes=False)
+    except ImportError:
+        _json_loads = json.loads
+
+        def _json_dumps(obj, indent=False):
+            return json.dumps(obj, indent=2 if indent else None)
 
 try:
     from dotenv import load_dotenv
@@ -20,7 +52,8 @@ except Exception:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# For Lambda: get credentials from Secrets Manager
+# For Lambda: get credentials from Secrets Manager (once per warm container)
+@functools.lru_cache(maxsize=1)
 def _get_lambda_credentials():
     """Retrieve SAP credentials from AWS Secrets Manager for Lambda"""
     secret_arn = os.getenv('SECRET_ARN')
@@ -46,6 +79,10 @@ USE_JSON = True    # switch to XML by setting False
 
 REQUIRED_ENV = ("SAP_HOST", "SAP_USER", "SAP_PASSWORD")
 
+# Container-constant URL pieces: only the path and query vary per request
+_BASE_URL = f"https://{SAP_HOST}"
+_URL_SAFE_CHARS = "'() "
+
 def _missing_env():
     missing = []
     if not SAP_HOST:
@@ -57,11 +94,13 @@ def _missing_env():
     return missing
 
 
-def _build_url(path, po_number=None, select=None, orderby=None):
+def _build_url(path, po_number=None, select=None, orderby=None, filters=None):
     params = {}
     if po_number:
         q = f"PurchaseOrder eq '{po_number}'"
-        params["$filter"] = q
+        params["$filter"] = f"{q} and {filters}" if filters else q
+    elif filters:
+        params["$filter"] = filters
     params["$format"] = "json" if USE_JSON else "xml"
     if select:
         params["$select"] = ",".join(select)
@@ -69,10 +108,8 @@ def _build_url(path, po_number=None, select=None, orderby=None):
         params["$orderby"] = orderby
     if SAP_CLIENT:
         params["sap-client"] = SAP_CLIENT
-    # Use variable to avoid backslash in f-string
-    safe_chars = "'() "
-    query_string = urllib.parse.urlencode(params, safe=safe_chars)
-    return f'https://{SAP_HOST}{path}?{query_string}'
+    query_string = urllib.parse.urlencode(params, safe=_URL_SAFE_CHARS)
+    return f'{_BASE_URL}{path}?{query_string}'
 
 
 def _basic_auth_header(user, pwd):
@@ -80,48 +117,76 @@ def _basic_auth_header(user, pwd):
     return f"Basic {token}"
 
 
-def _make_opener(context, no_proxies=True):
-    handlers = [urllib.request.HTTPSHandler(context=context)]
-    if no_proxies:
-        handlers.append(urllib.request.ProxyHandler({}))
-    return urllib.request.build_opener(*handlers)
+# Credentials are fixed for the container's lifetime, so encode the header once
+_AUTH_HEADER = _basic_auth_header(SAP_USER, SAP_PASSWORD)
+
+
+# One TLS context and keep-alive pool per container: warm invocations reuse
+# the open connection to SAP instead of paying a TCP+TLS handshake per call.
+_SSL_CONTEXT = ssl.create_default_context()
+# Fan-out width for fetch_parallel. The pool keeps one extra connection for the
+# handler thread, so parallel fetches never open throwaway connections that
+# urllib3 would discard instead of returning to the pool.
+SAP_MAX_CONCURRENCY = int(os.getenv("SAP_MAX_CONCURRENCY", "4"))
+_HTTP = urllib3.PoolManager(maxsize=SAP_MAX_CONCURRENCY + 1, retries=False, ssl_context=_SSL_CONTEXT)
+_CAFILE_POOLS = {}  # cafile -> PoolManager, so a custom CA bundle is also loaded once
+
+
+def _pool_for(cafile):
+    if not cafile:
+        return _HTTP
+    pool = _CAFILE_POOLS.get(cafile)
+    if pool is None:
+        pool = urllib3.PoolManager(retries=False, ssl_context=ssl.create_default_context(cafile=cafile))
+        _CAFILE_POOLS[cafile] = pool
+    return pool
+
+
+# Retry sleeps use "full jitter" (uniform in [0, capped exponential]) so
+# concurrent Lambdas hitting a throttled SAP system don't retry in lockstep.
+MAX_BACKOFF = 8.0
+
+
+def _retry_delay(attempt, backoff=0.8, retry_after=None):
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form; use the computed delay
+    return random.uniform(0, min(MAX_BACKOFF, backoff * (2 ** attempt)))
 
 
 def make_sap_request(url, timeout=30, retries=3, backoff=0.8, cafile=None, accept_header=None):
-    context = ssl.create_default_context(cafile=cafile) if cafile else ssl.create_default_context()
-    opener = _make_opener(context, no_proxies=True)
+    http = _pool_for(cafile)
+    headers = {
+        "Authorization": _AUTH_HEADER,
+        "Accept": accept_header or ("application/json" if USE_JSON else "application/atom+xml"),
+        "User-Agent": "sap-odata-test/1.0",
+        # Same key on every retry of this request, so the retry loop stays safe
+        # if it is ever used for non-idempotent calls
+        "X-Idempotency-Key": hashlib.sha1(url.encode()).hexdigest(),
+    }
 
     for attempt in range(retries):
         try:
-            req = urllib.request.Request(url)
-            req.add_header("Authorization", _basic_auth_header(SAP_USER, SAP_PASSWORD))
-            req.add_header("Accept", accept_header or ("application/json" if USE_JSON else "application/atom+xml"))
-            req.add_header("User-Agent", "sap-odata-test/1.0")
-            req.add_header("Connection", "close")
-
-            with opener.open(req, timeout=timeout) as resp:
-                body = resp.read().decode("utf-8")
-                if resp.status == 200:
-                    return {"status": "success", "data": body}
-                return {"status": "error", "message": f"HTTP {resp.status}", "details": body}
-
-        except urllib.error.HTTPError as e:
-            try:
-                body = e.read().decode("utf-8")
-            except Exception:
-                body = ""
-            if e.code in (429, 500, 502, 503, 504) and attempt < retries - 1:
-                time.sleep(backoff * (2 ** attempt))
+            resp = http.request("GET", url, headers=headers, timeout=timeout)
+            if resp.status == 200:
+                # Raw bytes: the JSON/XML parsers take them directly, skipping a decode pass
+                return {"status": "success", "data": resp.data}
+            body = resp.data.decode("utf-8", "replace")
+            if resp.status in (429, 500, 502, 503, 504) and attempt < retries - 1:
+                time.sleep(_retry_delay(attempt, backoff, resp.headers.get("Retry-After")))
                 continue
-            return {"status": "error", "message": f"HTTP Error {e.code}: {e.reason}", "details": body}
-
-        except urllib.error.URLError as e:
-            msg = str(e.reason)
-            transient = "Remote end closed connection without response" in msg or "timed out" in msg
-            if transient and attempt < retries - 1:
-                time.sleep(backoff * (2 ** attempt))
+            if resp.status >= 400:
+                return {"status": "error", "message": f"HTTP Error {resp.status}: {resp.reason}", "details": body}
+            return {"status": "error", "message": f"HTTP {resp.status}", "details": body}
+
+        except (urllib3.exceptions.ProtocolError, urllib3.exceptions.TimeoutError) as e:
+            # Dropped keep-alive connections and timeouts are worth another attempt
+            if attempt < retries - 1:
+                time.sleep(_retry_delay(attempt, backoff))
                 continue
-            return {"status": "error", "message": msg}
+            return {"status": "error", "message": str(e)}
 
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -129,32 +194,40 @@ def make_sap_request(url, timeout=30, retries=3, backoff=0.8, cafile=None, accep
     return {"status": "error", "message": "Exhausted retries"}
 
 
+_ATOM_ENTRY = "{http://www.w3.org/2005/Atom}entry"
+_M_PROPERTIES = "{http://schemas.microsoft.com/ado/2007/08/dataservices/metadata}properties"
+
+
+def _preview(raw, limit=500):
+    text = raw[:limit]
+    return text.decode("utf-8", "replace") if isinstance(text, bytes) else text
+
+
 def parse_xml_entries(xml_content):
+    # Stream <entry> elements instead of building the whole DOM, clearing each
+    # one once its properties are copied out so large feeds stay flat in memory
     try:
-        root = ET.fromstring(xml_content)
-        ns = {
-            "atom": "http://www.w3.org/2005/Atom",
-            "d": "http://schemas.microsoft.com/ado/2007/08/dataservices",
-            "m": "http://schemas.microsoft.com/ado/2007/08/dataservices/metadata",
-        }
+        source = xml_content.encode("utf-8") if isinstance(xml_content, str) else xml_content
         entries = []
-        for entry in root.findall(".//atom:entry", ns):
-            props = entry.find(".//m:properties", ns)
-            if props is None:
+        for _, elem in _etree.iterparse(io.BytesIO(source), events=("end",)):
+            if elem.tag != _ATOM_ENTRY:
                 continue
-            data = {}
-            for prop in props:
-                tag = prop.tag.split("}")[-1]
-                data[tag] = prop.text or ""
-            entries.append(data)
+            props = elem.find(".//" + _M_PROPERTIES)
+            if props is not None:
+                data = {}
+                for prop in props:
+                    tag = prop.tag.split("}")[-1]
+                    data[tag] = prop.text or ""
+                entries.append(data)
+            elem.clear()
         return {"entries": entries, "total_count": len(entries)}
     except Exception as e:
-        return {"parse_error": str(e), "raw_xml_preview": xml_content[:500]}
+        return {"parse_error": str(e), "raw_xml_preview": _preview(xml_content)}
 
 
 def parse_json_entries(json_text):
     try:
-        obj = json.loads(json_text)
+        obj = _json_loads(json_text)
         # OData v2 JSON usually nests under d.results
         d = obj.get("d", {})
         if isinstance(d, dict) and "results" in d:
@@ -168,11 +241,10 @@ def parse_json_entries(json_text):
             return {"entries": [d], "total_count": 1}
         return {"entries": [], "total_count": 0}
     except Exception as e:
-        return {"parse_error": str(e), "raw_json_preview": json_text[:500]}
+        return {"parse_error": str(e), "raw_json_preview": _preview(json_text)}
 
 
-def _fetch_and_parse(url):
-    res = make_sap_request(url)
+def _parse_response(res, url):
     if res["status"] != "success":
         res["url"] = url
         return res
@@ -183,11 +255,129 @@ def _fetch_and_parse(url):
     return {"status": "success", "data": parsed, "url": url}
 
 
+def _fetch_and_parse(url):
+    return _parse_response(make_sap_request(url), url)
+
+
+# OData $batch: several GETs against the PO service in one POST round-trip.
+# Opt-in (SAP_USE_BATCH=1) because SAP Gateway needs a CSRF token for the POST
+# and not every system exposes $batch on C_PURCHASEORDER_FS_SRV.
+SAP_USE_BATCH = os.getenv("SAP_USE_BATCH") == "1"
+_PO_SERVICE_PATH = "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/"
+_CSRF = {}  # token/cookie pair, fetched once per container
+
+
+def _fetch_csrf(timeout=30):
+    resp = _HTTP.request(
+        "GET", f"{_BASE_URL}{_PO_SERVICE_PATH}",
+        headers={"Authorization": _AUTH_HEADER, "X-CSRF-Token": "Fetch"},
+        timeout=timeout,
+    )
+    token = resp.headers.get("x-csrf-token")
+    if resp.status != 200 or not token:
+        return None
+    _CSRF["token"] = token
+    _CSRF["cookie"] = "; ".join(c.split(";", 1)[0] for c in resp.headers.getlist("set-cookie"))
+    return _CSRF
+
+
+def _parse_batch_response(body, content_type):
+    boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip('"')
+    results = []
+    for part in body.split(f"--{boundary}")[1:]:
+        if part.startswith("--"):
+            break
+        # part headers, blank line, embedded HTTP response (status line, headers, blank line, body)
+        http_part = part.split("\r\n\r\n", 1)[1]
+        head, _, payload = http_part.partition("\r\n\r\n")
+        status_line = head.split("\r\n", 1)[0]
+        status = int(status_line.split(" ", 2)[1])
+        payload = payload.rstrip("\r\n")
+        if status == 200:
+            results.append({"status": "success", "data": payload})
+        else:
+            results.append({"status": "error", "message": f"HTTP Error {status}: {status_line.split(' ', 2)[-1]}", "details": payload})
+    return results
+
+
+def make_sap_batch_request(urls, timeout=30):
+    """Execute several GET URLs of the PO service as one OData $batch request.
+
+    Returns one make_sap_request-style result per URL, in order, or None when
+    the batch itself failed so the caller can fall back to individual GETs.
+    """
+    boundary = "batch_po"
+    prefix = f"{_BASE_URL}{_PO_SERVICE_PATH}"
+    accept = "application/json" if USE_JSON else "application/atom+xml"
+    lines = []
+    for url in urls:
+        lines += [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            "Content-Transfer-Encoding: binary",
+            "",
+            f"GET {url[len(prefix):]} HTTP/1.1",
+            f"Accept: {accept}",
+            "",
+            "",
+        ]
+    lines.append(f"--{boundary}--")
+    body = "\r\n".join(lines)
+
+    try:
+        csrf = _CSRF or _fetch_csrf(timeout)
+        if not csrf:
+            return None
+        resp = _HTTP.request(
+            "POST", f"{prefix}$batch", body=body.encode("utf-8"), timeout=timeout,
+            headers={
+                "Authorization": _AUTH_HEADER,
+                "Content-Type": f"multipart/mixed; boundary={boundary}",
+                "X-CSRF-Token": csrf["token"],
+                "X-Idempotency-Key": hashlib.sha1(body.encode("utf-8")).hexdigest(),
+                "Cookie": csrf["cookie"],
+            },
+        )
+        if resp.status == 403:
+            _CSRF.clear()  # token expired with the session; next call refetches
+            return None
+        if resp.status != 202:
+            return None
+        results = _parse_batch_response(resp.data.decode("utf-8"), resp.headers.get("Content-Type", ""))
+        return results if len(results) == len(urls) else None
+    except Exception as e:
+        logger.warning(f"$batch request failed, falling back to individual GETs: {e}")
+        return None
+
+
+# Shared worker pool for concurrent SAP fetches. Created once per container so
+# warm invocations skip thread start-up; sized to match the urllib3 pool so
+# every worker can hold its own keep-alive connection.
+_EXECUTOR = ThreadPoolExecutor(max_workers=SAP_MAX_CONCURRENCY)
+
+
+def fetch_parallel(*calls):
+    """Run independent SAP fetches concurrently and return results in call order.
+
+    Each call is a zero-argument callable (e.g. functools.partial(get_purchase_order, po)).
+    The work is HTTPS I/O, so threads overlap the round-trips and total latency
+    becomes the slowest call rather than the sum of all of them. Calls must not
+    themselves use fetch_parallel (they would wait on the same pool).
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    futures = [_EXECUTOR.submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+
+# OData v2 date format: /Date(1571616000000)/ or with offset /Date(1588894563127+0000)/
+_SAP_DATE_RE = re.compile(r"/Date\((\d+)([+-]\d{4})?\)/")
+
+
 def _format_sap_date(value):
     if not isinstance(value, str):
         return value
-    # OData v2 date format: /Date(1571616000000)/ or with offset /Date(1588894563127+0000)/
-    m = re.match(r"/Date\((\d+)([+-]\d{4})?\)/", value)
+    m = _SAP_DATE_RE.match(value)
     if not m:
         return value
     try:
@@ -197,75 +387,153 @@ def _format_sap_date(value):
         return value
 
 
+_NUMERIC_FIELDS = frozenset(("NetAmount", "OrderQuantity", "NetPriceAmount", "GrossAmount", "EffectiveAmount"))
+
+
+def _to_float(value):
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except Exception:
+            pass
+    return value
+
+
+def _to_item_number(value):
+    if isinstance(value, str):
+        try:
+            return int(value.lstrip("0") or "0")
+        except Exception:
+            pass
+    return value
+
+
 def _clean_entry(entry):
     if not isinstance(entry, dict):
         return entry
-    cleaned = {k: v for k, v in entry.items() if not k.startswith("__")}
-    # normalize date fields
-    for k in list(cleaned.keys()):
-        if k.lower().endswith("date") or k.lower().endswith("datetime"):
-            cleaned[k] = _format_sap_date(cleaned[k])
-    # numeric coercions
-    for nf in ("NetAmount", "OrderQuantity", "NetPriceAmount", "GrossAmount", "EffectiveAmount"):
-        if nf in cleaned and isinstance(cleaned[nf], str):
-            try:
-                cleaned[nf] = float(cleaned[nf])
-            except Exception:
-                pass
+    # single pass: drop __metadata, normalize date fields, coerce numerics
+    cleaned = {}
+    for k, v in entry.items():
+        if k.startswith("__"):
+            continue
+        lk = k.lower()
+        if lk.endswith("date") or lk.endswith("datetime"):
+            v = _format_sap_date(v)
+        elif k in _NUMERIC_FIELDS:
+            v = _to_float(v)
+        cleaned[k] = v
     # item number to int
-    if isinstance(cleaned.get("PurchaseOrderItem"), str):
-        try:
-            cleaned["PurchaseOrderItem"] = int(cleaned["PurchaseOrderItem"].lstrip("0") or "0")
-        except Exception:
-            pass
+    if "PurchaseOrderItem" in cleaned:
+        cleaned["PurchaseOrderItem"] = _to_item_number(cleaned["PurchaseOrderItem"])
     # unified description
     cleaned["Name"] = cleaned.get("PurchaseOrderItemText") or cleaned.get("MaterialDescription") or ""
     return cleaned
 
 
+_PO_HEADER_SELECT = [
+    "PurchaseOrder","CompanyCode","PurchasingOrganization","PurchasingGroup",
+    "Supplier","DocumentCurrency","PurchaseOrderDate","CreationDate"
+]
+
+_PO_ITEM_SELECT_VARIANTS = [
+    [
+        "PurchaseOrder", "PurchaseOrderItem", "Material",
+        "PurchaseOrderItemText",  # preferred description in many systems
+        "MaterialGroup", "DocumentCurrency",
+        "OrderQuantity", "PurchaseOrderQuantityUnit",
+        "NetAmount", "NetPriceAmount", "TaxCode",
+    ],
+    [
+        "PurchaseOrder", "PurchaseOrderItem", "Material",
+        "MaterialDescription",  # alternative field name
+        "MaterialGroup", "DocumentCurrency",
+        "OrderQuantity", "PurchaseOrderQuantityUnit",
+        "NetAmount", "NetPriceAmount", "TaxCode",
+    ],
+    [
+        # minimal working set without description fields
+        "PurchaseOrder", "PurchaseOrderItem", "Material",
+        "MaterialGroup", "DocumentCurrency",
+        "OrderQuantity", "PurchaseOrderQuantityUnit",
+        "NetAmount", "NetPriceAmount", "TaxCode",
+    ],
+]
+
+
+def _po_header_url(po_number):
+    return _build_url("/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrder", po_number, select=_PO_HEADER_SELECT)
+
+
+def _po_items_url(po_number, select):
+    return _build_url(
+        "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
+        po_number,
+        select=select,
+        orderby="PurchaseOrderItem asc",
+    )
+
+
 def get_purchase_order(po_number):
-    select = [
-        "PurchaseOrder","CompanyCode","PurchasingOrganization","PurchasingGroup",
-        "Supplier","DocumentCurrency","PurchaseOrderDate","CreationDate"
-    ]
-    url = _build_url("/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrder", po_number, select=select)
-    return _fetch_and_parse(url)
+    return _fetch_and_parse(_po_header_url(po_number))
+
+
+# Properties of the item entity type, read from $metadata once per container so
+# the $select can be fitted to this system up front instead of probing variants.
+# An empty set means the schema has no such entity type; the variant probing is
+# used then. It stays None after a failed fetch/parse so a later call retries,
+# at most once per _ITEM_FIELDS_RETRY_SECONDS.
+_ITEM_FIELDS = None
+_ITEM_FIELDS_RETRY_SECONDS = 60
+_item_fields_retry_at = 0.0
+
+
+def _entity_properties(metadata_xml, type_names):
+    root = _etree.fromstring(metadata_xml.encode("utf-8"))
+    for elem in root.iter():
+        if isinstance(elem.tag, str) and elem.tag.endswith("}EntityType") and elem.get("Name") in type_names:
+            return frozenset(
+                child.get("Name") for child in elem
+                if isinstance(child.tag, str) and child.tag.endswith("}Property")
+            )
+    return frozenset()
+
+
+def _item_select():
+    """$select for I_PurchaseOrderItem that this system supports, or None if unknown."""
+    global _ITEM_FIELDS, _item_fields_retry_at
+    fields = _ITEM_FIELDS
+    if fields is None:
+        if time.monotonic() < _item_fields_retry_at:
+            return None
+        res = fetch_metadata()
+        try:
+            if res["status"] != "success":
+                raise RuntimeError(res.get("message") or res["status"])
+            fields = _entity_properties(res["data"], ("I_PurchaseOrderItemType", "I_PurchaseOrderItem"))
+        except Exception as e:
+            logger.warning(f"Could not read item fields from $metadata: {e}")
+            _item_fields_retry_at = time.monotonic() + _ITEM_FIELDS_RETRY_SECONDS
+            return None
+        _ITEM_FIELDS = fields
+    if not fields:
+        return None
+    select = [f for f in _PO_ITEM_SELECT_VARIANTS[0] if f in fields]
+    if "PurchaseOrderItemText" not in fields and "MaterialDescription" in fields:
+        select.append("MaterialDescription")
+    return select
 
 
 def get_purchase_order_items(po_number):
-    select_variants = [
-        [
-            "PurchaseOrder", "PurchaseOrderItem", "Material",
-            "PurchaseOrderItemText",  # preferred description in many systems
-            "MaterialGroup", "DocumentCurrency",
-            "OrderQuantity", "PurchaseOrderQuantityUnit",
-            "NetAmount", "NetPriceAmount", "TaxCode",
-        ],
-        [
-            "PurchaseOrder", "PurchaseOrderItem", "Material",
-            "MaterialDescription",  # alternative field name
-            "MaterialGroup", "DocumentCurrency",
-            "OrderQuantity", "PurchaseOrderQuantityUnit",
-            "NetAmount", "NetPriceAmount", "TaxCode",
-        ],
-        [
-            # minimal working set without description fields
-            "PurchaseOrder", "PurchaseOrderItem", "Material",
-            "MaterialGroup", "DocumentCurrency",
-            "OrderQuantity", "PurchaseOrderQuantityUnit",
-            "NetAmount", "NetPriceAmount", "TaxCode",
-        ],
-    ]
+    select = _item_select()
+    if select:
+        res = _fetch_and_parse(_po_items_url(po_number, select))
+        if res.get("status") == "success":
+            return res
 
     last_error = None
     last_url = None
-    for sel in select_variants:
-        url = _build_url(
-            "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
-            po_number,
-            select=sel,
-            orderby="PurchaseOrderItem asc",
-        )
+    for sel in _PO_ITEM_SELECT_VARIANTS:
+        url = _po_items_url(po_number, sel)
         res = _fetch_and_parse(url)
         last_url = url
         if res.get("status") == "success":
@@ -276,9 +544,41 @@ def get_purchase_order_items(po_number):
     return {"status": "error", "message": last_error.get("message"), "details": last_error.get("details"), "url": last_url}
 
 
+def _get_po_batch(po_number):
+    """Header + items in one $batch round-trip; None if the batch is unavailable."""
+    urls = [_po_header_url(po_number), _po_items_url(po_number, _item_select() or _PO_ITEM_SELECT_VARIANTS[0])]
+    results = make_sap_batch_request(urls)
+    if results is None:
+        return None
+    header_res, items_res = (_parse_response(res, url) for res, url in zip(results, urls))
+    if items_res.get("status") != "success":
+        # the remaining $select variants go through the regular path
+        items_res = get_purchase_order_items(po_number)
+    return header_res, items_res
+
+
+class POItem(NamedTuple):
+    """Compact PO line as returned under "items" (converted to a dict at the end)."""
+    item: Optional[int]
+    material: Optional[str]
+    name: Optional[str]
+    qty: float
+    uom: Optional[str]
+    price: float
+    net: float
+    currency: Optional[str]
+    tax: Optional[str]
+
+
 def get_complete_po_data(po_number):
-    header_res = get_purchase_order(po_number)
-    items_res = get_purchase_order_items(po_number)
+    batched = _get_po_batch(po_number) if SAP_USE_BATCH else None
+    if batched:
+        header_res, items_res = batched
+    else:
+        header_res, items_res = fetch_parallel(
+            functools.partial(get_purchase_order, po_number),
+            functools.partial(get_purchase_order_items, po_number),
+        )
 
     header_entry = {}
     if header_res.get("status") == "success":
@@ -288,27 +588,38 @@ def get_complete_po_data(po_number):
 
     items_compact = []
     items_error = None
+    # Totals are accumulated while the compact items are built (single pass)
+    total_value = 0.0
+    total_quantity = 0.0
     if items_res.get("status") == "success":
+        append = items_compact.append
+        # Only the nine compact fields are read and coerced straight from the raw
+        # entry; a full _clean_entry would also walk __metadata and every date field
         for it in items_res.get("data", {}).get("entries", []):
-            itc = _clean_entry(it)
-            items_compact.append({
-                "item": itc.get("PurchaseOrderItem"),
-                "material": itc.get("Material"),
-                "name": itc.get("Name"),
-                "qty": itc.get("OrderQuantity") or 0.0,
-                "uom": itc.get("PurchaseOrderQuantityUnit"),
-                "price": itc.get("NetPriceAmount") or 0.0,
-                "net": itc.get("NetAmount") or 0.0,
-                "currency": itc.get("DocumentCurrency"),
-                "tax": itc.get("TaxCode"),
-            })
-        items_compact.sort(key=lambda x: (x["item"] is None, x.get("item", 0)))
+            get = it.get
+            qty = _to_float(get("OrderQuantity")) or 0.0
+            net = _to_float(get("NetAmount")) or 0.0
+            total_quantity += qty
+            total_value += net
+            append(POItem(
+                _to_item_number(get("PurchaseOrderItem")),
+                get("Material"),
+                get("PurchaseOrderItemText") or get("MaterialDescription") or "",
+                qty,
+                get("PurchaseOrderQuantityUnit"),
+                _to_float(get("NetPriceAmount")) or 0.0,
+                net,
+                get("DocumentCurrency"),
+                get("TaxCode"),
+            ))
+        # SAP already returns lines in $orderby=PurchaseOrderItem asc order; only
+        # lines without an item number need moving to the end
+        if any(row.item is None for row in items_compact):
+            items_compact = [row for row in items_compact if row.item is not None] + \
+                            [row for row in items_compact if row.item is None]
     else:
         items_error = {k: v for k, v in items_res.items() if k in ("message", "details")}
 
-    total_value = sum((x.get("net") or 0.0) for x in items_compact)
-    total_quantity = sum((x.get("qty") or 0.0) for x in items_compact)
-
     summary = {
         "po_number": po_number,
         "header_found": bool(header_entry),
@@ -321,7 +632,7 @@ def get_complete_po_data(po_number):
     result = {
         "purchase_order": po_number,
         "header": header_entry,
-        "items": items_compact,
+        "items": [row._asdict() for row in items_compact],
         "summary": summary,
         "links": {
             "header_url": header_res.get("url"),
@@ -333,39 +644,71 @@ def get_complete_po_data(po_number):
     return result
 
 
-def extract_po_number_from_bedrock_event(event):
-    po_number = None
+# Per-container LRU of recent get_complete_po_data results, keyed by PO number.
+# Agents frequently re-ask about the same PO; a warm container can answer those
+# repeats without another SAP round-trip while the entry is fresh.
+PO_CACHE_MAXSIZE = 128
+PO_CACHE_TTL = float(os.getenv("PO_CACHE_TTL", "60"))
+_PO_CACHE = OrderedDict()  # po_number -> (stored_at, result)
+
 
+def _po_cache_get(po_number):
+    hit = _PO_CACHE.get(po_number)
+    if hit is None:
+        return None
+    stored_at, result = hit
+    if time.monotonic() - stored_at >= PO_CACHE_TTL:
+        del _PO_CACHE[po_number]
+        return None
+    _PO_CACHE.move_to_end(po_number)
+    return result
+
+
+def _po_cache_put(po_number, result):
+    _PO_CACHE[po_number] = (time.monotonic(), result)
+    _PO_CACHE.move_to_end(po_number)
+    while len(_PO_CACHE) > PO_CACHE_MAXSIZE:
+        _PO_CACHE.popitem(last=False)
+
+
+_PO_RE = re.compile(r"(?:PO\s*)?(\d{10})", re.IGNORECASE)
+
+
+def extract_po_number_from_bedrock_event(event):
     # Try MCP gateway format first (parameters as key-value pairs)
-    if "parameters" in event:
-        params = event.get("parameters", [])
-        if isinstance(params, list):
-            for param in params:
-                if isinstance(param, dict) and param.get("name") == "po_number":
-                    po_number = param.get("value")
-                    break
-        elif isinstance(params, dict):
-            po_number = params.get("po_number")
+    params = event.get("parameters")
+    if isinstance(params, list):
+        for param in params:
+            if isinstance(param, dict) and param.get("name") == "po_number":
+                if param.get("value"):
+                    return param["value"]
+                break
+    elif isinstance(params, dict) and params.get("po_number"):
+        return params["po_number"]
 
     # Try Bedrock format
-    if not po_number:
-        body = event.get("requestBody", {}).get("content", {}).get("application/json", {})
-        props = body.get("properties")
-        if isinstance(props, list):
-            for prop in props:
-                if prop.get("name") == "po_number":
-                    po_number = prop.get("value")
-                    break
+    try:
+        props = event["requestBody"]["content"]["application/json"]["properties"]
+    except (KeyError, TypeError):
+        props = None
+    if isinstance(props, list):
+        for prop in props:
+            if prop.get("name") == "po_number":
+                if prop.get("value"):
+                    return prop["value"]
+                break
 
     # Try direct parameter access
-    if not po_number:
-        po_number = event.get("po_number")
+    po_number = event.get("po_number")
+    if po_number:
+        return po_number
 
     # Try inputText extraction
-    if not po_number and event.get("inputText"):
-        m = re.search(r"(?:PO\s*)?(\d{10})", event["inputText"], re.IGNORECASE)
+    input_text = event.get("inputText")
+    if input_text:
+        m = _PO_RE.search(input_text)
         if m:
-            po_number = m.group(1)
+            return m.group(1)
 
     return po_number
 
@@ -374,27 +717,36 @@ def fetch_metadata():
     missing = _missing_env()
     if missing:
         return {"status": "error", "message": f"Missing env vars: {', '.join(missing)}"}
-    url = f"https://{SAP_HOST}/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/$metadata"
-    return make_sap_request(url, accept_header="application/xml")
+    url = f"{_BASE_URL}/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/$metadata"
+    res = make_sap_request(url, accept_header="application/xml")
+    if res["status"] == "success":
+        res["data"] = res["data"].decode("utf-8")
+    return res
+
+
+def _bedrock_response(event, status_code, body):
+    """Bedrock action-group response envelope; body is a pre-serialised string or a JSON-able object."""
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get("actionGroup", ""),
+            "apiPath": event.get("apiPath", ""),
+            "httpMethod": event.get("httpMethod", "POST"),
+            "httpStatusCode": status_code,
+            "responseBody": {"TEXT": {"body": body if isinstance(body, str) else _json_dumps(body)}},
+        },
+    }
 
 
 def lambda_handler(event, context):
-    logger.info("event=%s", json.dumps(event))
+    # Full event/response dumps only at DEBUG; INFO gets a one-line summary
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("event=%s", _json_dumps(event))
     try:
         missing = _missing_env()
         if missing:
-            err_body = {"error": f"Missing env vars: {', '.join(missing)}"}
-            response_body = {"TEXT": {"body": json.dumps(err_body)}}
-            return {
-                "messageVersion": "1.0",
-                "response": {
-                    "actionGroup": event.get("actionGroup", ""),
-                    "apiPath": event.get("apiPath", ""),
-                    "httpMethod": event.get("httpMethod", "POST"),
-                    "httpStatusCode": 500,
-                    "responseBody": response_body,
-                },
-            }
+            return _bedrock_response(event, 500, {"error": f"Missing env vars: {', '.join(missing)}"})
         po_number = extract_po_number_from_bedrock_event(event)
 
         if not po_number:
@@ -404,44 +756,25 @@ def lambda_handler(event, context):
                 "message": "Please provide a valid purchase order number. Example: '4500001818'",
                 "hint": "For multiple POs or delivery dates, consider using 'list_purchase_orders' or 'search_purchase_orders' tools instead."
             }
-            response_body = {"TEXT": {"body": json.dumps(err_body)}}
-            return {
-                "messageVersion": "1.0",
-                "response": {
-                    "actionGroup": event.get("actionGroup", ""),
-                    "apiPath": event.get("apiPath", ""),
-                    "httpMethod": event.get("httpMethod", "POST"),
-                    "httpStatusCode": 400,
-                    "responseBody": response_body,
-                },
-            }
-
-        result = get_complete_po_data(po_number)
-        response_body = {"TEXT": {"body": json.dumps(result, indent=2)}}
-        resp = {
-            "messageVersion": "1.0",
-            "response": {
-                "actionGroup": event.get("actionGroup", ""),
-                "apiPath": event.get("apiPath", ""),
-                "httpMethod": event.get("httpMethod", "POST"),
-                "httpStatusCode": 200,
-                "responseBody": response_body,
-            },
-        }
-        logger.info("response=%s", json.dumps(resp))
+            return _bedrock_response(event, 400, err_body)
+
+        result = _po_cache_get(po_number)
+        if result is None:
+            result = get_complete_po_data(po_number)
+            # Only cache complete answers; partial/failed lookups are retried next time
+            if result["summary"]["header_found"] and "items_error" not in result:
+                _po_cache_put(po_number, result)
+        resp = _bedrock_response(event, 200, _json_dumps(result, indent=True))
+        if debug:
+            logger.debug("response=%s", _json_dumps(resp))
+        else:
+            summary = result["summary"]
+            logger.info("po=%s header_found=%s items=%d%s", po_number, summary["header_found"],
+                        summary["items_count"], " items_error" if "items_error" in result else "")
         return resp
     except Exception as e:
-        err = {
-            "messageVersion": "1.0",
-            "response": {
-                "actionGroup": event.get("actionGroup", ""),
-                "apiPath": event.get("apiPath", ""),
-                "httpMethod": event.get("httpMethod", "POST"),
-                "httpStatusCode": 500,
-                "responseBody": {"TEXT": {"body": json.dumps({"error": str(e), "type": type(e).__name__})}},
-            },
-        }
-        logger.error("error=%s", json.dumps(err))
+        err = _bedrock_response(event, 500, {"error": str(e), "type": type(e).__name__})
+        logger.error("error=%s", _json_dumps(err))
         return err
 
 
@@ -454,10 +787,9 @@ def get_stock_levels(material_number):
     url = _build_url(
         "/sap/opu/odata/sap/C_MATERIAL_STOCK_SRV/I_MaterialStock",
         select=select,
-        orderby="AvailableQuantity desc"
+        orderby="AvailableQuantity desc",
+        filters=f"Material eq '{material_number}'"
     )
-    # Add filter for specific material
-    url = url.replace("$select", f"$filter=Material eq '{material_number}'&$select")
     return _fetch_and_parse(url)
 
 
@@ -470,10 +802,9 @@ def get_low_stock_materials(threshold=None):
     url = _build_url(
         "/sap/opu/odata/sap/C_MATERIAL_STOCK_SRV/I_MaterialStock",
         select=select,
-        orderby="AvailableQuantity asc"
+        orderby="AvailableQuantity asc",
+        filters=f"AvailableQuantity lt {threshold}" if threshold else None
     )
-    if threshold:
-        url = url.replace("$select", f"$filter=AvailableQuantity lt {threshold}&$select")
     return _fetch_and_parse(url)
 
 
@@ -485,8 +816,8 @@ def get_material_info(material_number):
     ]
     url = _build_url(
         "/sap/opu/odata/sap/C_MATERIAL_SRV/I_Material",
-        material_number,
-        select=select
+        select=select,
+        filters=f"Material eq '{material_number}'"
     )
     return _fetch_and_parse(url)
 
@@ -497,21 +828,18 @@ def get_warehouse_stock(plant=None, storage_location=None):
         "Plant", "StorageLocation", "Material", "AvailableQuantity",
         "QuantityOnHand", "QuantityOrdered", "MaterialDescription"
     ]
-    url = _build_url(
-        "/sap/opu/odata/sap/C_MATERIAL_STOCK_SRV/I_MaterialStock",
-        select=select,
-        orderby="Plant,StorageLocation,Material"
-    )
     filters = []
     if plant:
         filters.append(f"Plant eq '{plant}'")
     if storage_location:
         filters.append(f"StorageLocation eq '{storage_location}'")
 
-    if filters:
-        filter_str = " and ".join(filters)
-        url = url.replace("$select", f"$filter={filter_str}&$select")
-
+    url = _build_url(
+        "/sap/opu/odata/sap/C_MATERIAL_STOCK_SRV/I_MaterialStock",
+        select=select,
+        orderby="Plant,StorageLocation,Material",
+        filters=" and ".join(filters) or None
+    )
     return _fetch_and_parse(url)
 
 
@@ -525,9 +853,9 @@ def get_purchase_orders_for_material(material_number):
     url = _build_url(
         "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
         select=select,
-        orderby="DeliveryDate asc"
+        orderby="DeliveryDate asc",
+        filters=f"Material eq '{material_number}'"
     )
-    url = url.replace("$select", f"$filter=Material eq '{material_number}'&$select")
     return _fetch_and_parse(url)
 
 
@@ -539,9 +867,9 @@ def get_goods_receipt(po_number):
     ]
     url = _build_url(
         "/sap/opu/odata/sap/C_GOODSRECEIPT_SRV/I_GoodsReceipt",
+        po_number,
         select=select
     )
-    url = url.replace("$select", f"$filter=PurchaseOrder eq '{po_number}'&$select")
     return _fetch_and_parse(url)
 
 
@@ -554,9 +882,9 @@ def forecast_material_demand(material_number, days_ahead=30):
     url = _build_url(
         "/sap/opu/odata/sap/C_DEMANDFORECAST_SRV/I_DemandForecast",
         select=select,
-        orderby="ForecastDate asc"
+        orderby="ForecastDate asc",
+        filters=f"Material eq '{material_number}'"
     )
-    url = url.replace("$select", f"$filter=Material eq '{material_number}'&$select")
     return _fetch_and_parse(url)
 
 
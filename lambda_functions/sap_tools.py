@@ -3,17 +3,44 @@ Multi-tool SAP Lambda function for MCP Gateway
 Provides multiple SAP operations: list POs, search POs, get material stock, etc.
 """
 import json
-import urllib.request
 import urllib.parse
-import urllib.error
 import base64
+import functools
+import hashlib
+import heapq
+import inspect
 import logging
+import random
 import re
 import ssl
+import threading
 import time
 import os
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+import urllib3
+
+# Fastest JSON codec available in the Lambda layer: orjson, then ujson, then
+# the stdlib. Both third-party codecs handle OData payloads several times faster.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    try:
+        import ujson
+        _json_loads = ujson.loads
+
+        def _json_dumps(obj):
+            return ujson.dumps(obj, escape_forward_slashes=False)
+    except ImportError:
+        _json_loads = json.loads
+        _json_dumps = json.dumps
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -24,8 +51,13 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # SAP credentials
+@functools.lru_cache(maxsize=1)
 def _get_lambda_credentials():
-    """Retrieve SAP credentials from AWS Secrets Manager for Lambda"""
+    """Retrieve SAP credentials from AWS Secrets Manager for Lambda (once per container)"""
+    # Credentials given explicitly in the environment (local runs) need no
+    # Secrets Manager round-trip, and no boto3 client at all
+    if all(os.getenv(k) for k in ("SAP_HOST", "SAP_USER", "SAP_PASSWORD")):
+        return None, None, None
     secret_arn = os.getenv('SECRET_ARN')
     if secret_arn:
         import boto3
@@ -46,67 +78,254 @@ SAP_PASSWORD = _sm_pass or os.getenv("SAP_PASSWORD")
 SAP_CLIENT = None
 USE_JSON = True
 
-def _build_url(path, filters=None, select=None, orderby=None, top=None):
-    """Build SAP OData URL with filters"""
-    params = {}
-    params["$format"] = "json" if USE_JSON else "xml"
-
-    if filters:
-        params["$filter"] = filters
+# Container-constant URL pieces. Parameter keys are pre-encoded exactly as
+# urlencode() would emit them ($ -> %24), so only the values need quoting.
+_BASE_URL = f"https://{SAP_HOST}"
+_URL_SAFE_CHARS = "'() "
+_FORMAT_QUERY = "%24format=" + ("json" if USE_JSON else "xml")
+_SAP_CLIENT_QUERY = f"&sap-client={SAP_CLIENT}" if SAP_CLIENT else ""
+
+# Long $filter/$select combinations can exceed the SAP gateway's URL limit and
+# fail with an opaque 4xx; warn when building one so the cause shows in logs
+SAP_URL_WARN_LENGTH = int(os.getenv("SAP_URL_WARN_LENGTH", "2048"))
+
+def _static_query(select=None, orderby=None):
+    """Encoded $select/$orderby fragment; tools with constant ones build it once at import"""
+    quote = urllib.parse.quote_plus
+    parts = []
     if select:
-        params["$select"] = ",".join(select)
+        parts += ("&%24select=", quote(",".join(select), _URL_SAFE_CHARS))
     if orderby:
-        params["$orderby"] = orderby
-    if top:
-        params["$top"] = str(top)
-    if SAP_CLIENT:
-        params["sap-client"] = SAP_CLIENT
+        parts += ("&%24orderby=", quote(orderby, _URL_SAFE_CHARS))
+    return "".join(parts)
 
-    safe_chars = "'() "
-    query_string = urllib.parse.urlencode(params, safe=safe_chars)
-    return f'https://{SAP_HOST}{path}?{query_string}'
+def _build_url(path, filters=None, select=None, orderby=None, top=None, static_query=None):
+    """Build SAP OData URL with filters"""
+    parts = [_BASE_URL, path, "?", _FORMAT_QUERY]
+    if filters:
+        parts += ("&%24filter=", urllib.parse.quote_plus(filters, _URL_SAFE_CHARS))
+    parts.append(static_query if static_query is not None else _static_query(select, orderby))
+    if top:
+        parts += ("&%24top=", str(top))
+    parts.append(_SAP_CLIENT_QUERY)
+    url = "".join(parts)
+    if len(url) > SAP_URL_WARN_LENGTH:
+        logger.warning("SAP URL is %d chars (> %d), the gateway may reject it: %s",
+                       len(url), SAP_URL_WARN_LENGTH, url[:200])
+    return url
 
 def _basic_auth_header(user, pwd):
     token = base64.b64encode(f"{user}:{pwd}".encode()).decode()
     return f"Basic {token}"
 
-def _make_opener(context, no_proxies=True):
-    handlers = [urllib.request.HTTPSHandler(context=context)]
-    if no_proxies:
-        handlers.append(urllib.request.ProxyHandler({}))
-    return urllib.request.build_opener(*handlers)
-
-def make_sap_request(url, timeout=30, retries=3):
-    """Make SAP OData request"""
-    context = ssl.create_default_context()
-    opener = _make_opener(context, no_proxies=True)
+# Credentials are fixed for the container's lifetime, so encode the header once
+_AUTH_HEADER = _basic_auth_header(SAP_USER, SAP_PASSWORD)
+
+# One TLS context and keep-alive pool per container: warm invocations (and the
+# several SAP calls a single tool makes) reuse open connections instead of
+# paying a TCP+TLS handshake per request.
+# Headers that never change for the container live on the pool itself.
+_SESSION_HEADERS = {
+    "Authorization": _AUTH_HEADER,
+    "Accept": "application/json" if USE_JSON else "application/atom+xml",
+    "User-Agent": "sap-odata-test/1.0",
+    "Connection": "keep-alive",
+}
+_SSL_CONTEXT = ssl.create_default_context()
+# Fan-out width for fetch_parallel. The pool keeps one extra connection for the
+# handler thread, so parallel fetches never open throwaway connections that
+# urllib3 would discard instead of returning to the pool.
+SAP_MAX_CONCURRENCY = int(os.getenv("SAP_MAX_CONCURRENCY", "4"))
+_HTTP = urllib3.PoolManager(maxsize=SAP_MAX_CONCURRENCY + 1, retries=False, ssl_context=_SSL_CONTEXT, headers=_SESSION_HEADERS)
+
+# Retry sleeps use "full jitter" (uniform in [0, capped exponential]) so
+# concurrent Lambdas hitting a throttled SAP system don't retry in lockstep.
+MAX_BACKOFF = 8.0
+
+def _retry_delay(attempt, backoff=0.8, retry_after=None):
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form; use the computed delay
+    return random.uniform(0, min(MAX_BACKOFF, backoff * (2 ** attempt)))
+
+# Per-container LRU of successful response bodies keyed by the full URL (which
+# already encodes filter/select/orderby/top). Tools like search_purchase_orders
+# and the in-transit views re-read the same endpoints across warm invocations;
+# within SAP_CACHE_TTL seconds those repeats skip SAP entirely. 0 disables it.
+SAP_CACHE_MAXSIZE = 128
+SAP_CACHE_TTL = float(os.getenv("SAP_CACHE_TTL", "60"))
+SAP_CACHE_MAX_BYTES = 1024 * 1024  # larger bodies are not worth pinning in memory
+_RESPONSE_CACHE = OrderedDict()  # url -> (stored_at, body)
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+def _cache_get(url):
+    with _RESPONSE_CACHE_LOCK:
+        hit = _RESPONSE_CACHE.get(url)
+        if hit is None:
+            return None
+        stored_at, body = hit
+        if time.monotonic() - stored_at >= SAP_CACHE_TTL:
+            del _RESPONSE_CACHE[url]
+            return None
+        _RESPONSE_CACHE.move_to_end(url)
+        return body
+
+def _cache_clear():
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE.clear()
+
+def _cache_put(url, body):
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[url] = (time.monotonic(), body)
+        _RESPONSE_CACHE.move_to_end(url)
+        while len(_RESPONSE_CACHE) > SAP_CACHE_MAXSIZE:
+            _RESPONSE_CACHE.popitem(last=False)
+
+def make_sap_request(url, timeout=30, retries=3, cache=True):
+    """Make SAP OData request (served from the response cache when fresh)"""
+    use_cache = cache and SAP_CACHE_TTL > 0
+    if use_cache:
+        body = _cache_get(url)
+        if body is not None:
+            return {"status": "success", "data": body}
+
+    # Per-request headers replace the pool defaults in urllib3, so extend them.
+    # Same idempotency key on every retry of this request, so the retry loop
+    # stays safe if it is ever used for non-idempotent calls.
+    headers = {**_SESSION_HEADERS, "X-Idempotency-Key": hashlib.sha1(url.encode()).hexdigest()}
 
     for attempt in range(retries):
         try:
-            req = urllib.request.Request(url)
-            req.add_header("Authorization", _basic_auth_header(SAP_USER, SAP_PASSWORD))
-            req.add_header("Accept", "application/json" if USE_JSON else "application/atom+xml")
-            req.add_header("User-Agent", "sap-odata-test/1.0")
-            req.add_header("Connection", "close")
-
-            with opener.open(req, timeout=timeout) as resp:
-                body = resp.read().decode("utf-8")
-                if resp.status == 200:
-                    return {"status": "success", "data": body}
-                return {"status": "error", "message": f"HTTP {resp.status}", "details": body}
+            resp = _HTTP.request("GET", url, headers=headers, timeout=timeout)
+            if resp.status == 200:
+                # Raw bytes: the JSON/XML parsers take them directly, skipping a decode pass
+                if use_cache and len(resp.data) <= SAP_CACHE_MAX_BYTES:
+                    _cache_put(url, resp.data)
+                return {"status": "success", "data": resp.data}
+            body = resp.data.decode("utf-8", "replace")
+            if resp.status in (429, 500, 502, 503, 504) and attempt < retries - 1:
+                time.sleep(_retry_delay(attempt, 0.8, resp.headers.get("Retry-After")))
+                continue
+            if resp.status >= 400:
+                return {"status": "error", "message": f"HTTP Error {resp.status}: {resp.reason}", "details": body}
+            return {"status": "error", "message": f"HTTP {resp.status}", "details": body}
 
         except Exception as e:
             if attempt < retries - 1:
-                time.sleep(0.8 * (2 ** attempt))
+                time.sleep(_retry_delay(attempt, 0.8))
                 continue
             return {"status": "error", "message": str(e)}
 
     return {"status": "error", "message": "Exhausted retries"}
 
+# OData $batch: several GETs against one service in a single POST round-trip.
+# Opt-in (SAP_USE_BATCH=1) because SAP Gateway needs a CSRF token for the POST
+# and not every service exposes $batch.
+SAP_USE_BATCH = os.getenv("SAP_USE_BATCH") == "1"
+_CSRF = {}  # service root -> {"token", "cookie"}, fetched once per container
+
+def _fetch_csrf(service_url, timeout=30):
+    resp = _HTTP.request("GET", service_url, headers={**_SESSION_HEADERS, "X-CSRF-Token": "Fetch"}, timeout=timeout)
+    token = resp.headers.get("x-csrf-token")
+    if resp.status != 200 or not token:
+        return None
+    _CSRF[service_url] = {
+        "token": token,
+        "cookie": "; ".join(c.split(";", 1)[0] for c in resp.headers.getlist("set-cookie")),
+    }
+    return _CSRF[service_url]
+
+def _parse_batch_response(body, content_type):
+    """Split a multipart/mixed $batch response into make_sap_request-style results"""
+    boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip('"')
+    results = []
+    for part in body.split(f"--{boundary}")[1:]:
+        if part.startswith("--"):
+            break
+        # part headers, blank line, embedded HTTP response (status line, headers, blank line, body)
+        http_part = part.split("\r\n\r\n", 1)[1]
+        head, _, payload = http_part.partition("\r\n\r\n")
+        status_line = head.split("\r\n", 1)[0]
+        status = int(status_line.split(" ", 2)[1])
+        payload = payload.rstrip("\r\n")
+        if status == 200:
+            results.append({"status": "success", "data": payload})
+        else:
+            results.append({"status": "error", "message": f"HTTP Error {status}: {status_line.split(' ', 2)[-1]}", "details": payload})
+    return results
+
+def _odata_batch(urls, timeout=60):
+    """Execute several GET URLs of the same OData service as one $batch request.
+
+    Returns one make_sap_request-style result per URL, in order, or None when
+    the batch itself failed so the caller can fall back to individual requests.
+    """
+    # Service root, e.g. https://host/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/
+    service_url = urls[0].split("?", 1)[0].rsplit("/", 1)[0] + "/"
+    boundary = "batch_sap_tools"
+    lines = []
+    for url in urls:
+        lines += [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            "Content-Transfer-Encoding: binary",
+            "",
+            f"GET {url[len(service_url):]} HTTP/1.1",
+            f"Accept: {_SESSION_HEADERS['Accept']}",
+            "",
+            "",
+        ]
+    lines.append(f"--{boundary}--")
+    body = "\r\n".join(lines)
+
+    try:
+        csrf = _CSRF.get(service_url) or _fetch_csrf(service_url, timeout)
+        if not csrf:
+            return None
+        resp = _HTTP.request(
+            "POST", f"{service_url}$batch", body=body.encode("utf-8"), timeout=timeout,
+            headers={
+                **_SESSION_HEADERS,
+                "Content-Type": f"multipart/mixed; boundary={boundary}",
+                "X-CSRF-Token": csrf["token"],
+                "X-Idempotency-Key": hashlib.sha1(body.encode("utf-8")).hexdigest(),
+                "Cookie": csrf["cookie"],
+            },
+        )
+        if resp.status == 403:
+            _CSRF.pop(service_url, None)  # token expired with the session; next call refetches
+            return None
+        if resp.status != 202:
+            return None
+        results = _parse_batch_response(resp.data.decode("utf-8"), resp.headers.get("Content-Type", ""))
+        return results if len(results) == len(urls) else None
+    except Exception as e:
+        logger.warning(f"$batch request failed, falling back to individual requests: {e}")
+        return None
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=SAP_MAX_CONCURRENCY)
+
+def fetch_parallel(*calls):
+    """Run independent zero-argument calls concurrently; results in call order.
+
+    The work is HTTPS I/O, so latency becomes the slowest call rather than the
+    sum. Calls must not themselves use fetch_parallel (same pool).
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    futures = [_EXECUTOR.submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+def _preview(raw, limit=500):
+    text = raw[:limit]
+    return text.decode("utf-8", "replace") if isinstance(text, bytes) else text
+
 def parse_json_entries(json_text):
     """Parse OData JSON response"""
     try:
-        obj = json.loads(json_text)
+        obj = _json_loads(json_text)
         d = obj.get("d", {})
         if isinstance(d, dict) and "results" in d:
             results = d.get("results")
@@ -118,13 +337,32 @@ def parse_json_entries(json_text):
             return {"entries": [d], "total_count": 1}
         return {"entries": [], "total_count": 0}
     except Exception as e:
-        return {"parse_error": str(e), "raw_json_preview": json_text[:500]}
+        return {"parse_error": str(e), "raw_json_preview": _preview(json_text)}
+
+def iter_json_entries(data):
+    """Yield the d.results entries of an already-read OData list response.
+
+    The body is parsed in one go with the fast JSON parser, so callers can
+    filter/group entries in a single loop. Raises ValueError on malformed JSON.
+    """
+    parsed = parse_json_entries(data)
+    if "parse_error" in parsed:
+        raise ValueError(parsed["parse_error"])
+    yield from parsed["entries"]
+
+_SAP_DATE_RE = re.compile(r"/Date\((\d+)([+-]\d{4})?\)/")
 
 def _format_sap_date(value):
     """Format SAP OData date"""
     if not isinstance(value, str):
         return value
-    m = re.match(r"/Date\((\d+)([+-]\d{4})?\)/", value)
+    return _format_sap_date_str(value)
+
+# The same few dates repeat across every item of an order (and across orders),
+# so memoize the whole regex + strftime conversion per distinct string
+@functools.lru_cache(maxsize=4096)
+def _format_sap_date_str(value):
+    m = _SAP_DATE_RE.match(value)
     if not m:
         return value
     try:
@@ -133,31 +371,80 @@ def _format_sap_date(value):
     except Exception:
         return value
 
+_NUMERIC_FIELDS = frozenset(("NetAmount", "OrderQuantity", "NetPriceAmount", "GrossAmount", "AvailableQuantity"))
+
+# SAP flag values meaning "yes" (OData boolean, string form, ABAP "X")
+_TRUTHY = frozenset((True, "true", "X"))
+
+@functools.lru_cache(maxsize=512)
+def _is_date_key(key):
+    lk = key.lower()
+    return lk.endswith("date") or lk.endswith("datetime")
+
+# SAP only sends __metadata/__deferred today; set to "1" to drop any "__" key
+SAP_STRIP_ALL_DUNDER = os.getenv("SAP_STRIP_ALL_DUNDER") == "1"
+
 def _clean_entry(entry):
-    """Clean and normalize SAP entry"""
+    """Clean and normalize SAP entry
+
+    Works in place: entries are parsed fresh from each response body and are
+    not shared, so there is no need to rebuild every dict.
+    """
     if not isinstance(entry, dict):
         return entry
-    cleaned = {k: v for k, v in entry.items() if not k.startswith("__")}
-
-    # Format dates
-    for k in list(cleaned.keys()):
-        if k.lower().endswith("date") or k.lower().endswith("datetime"):
-            cleaned[k] = _format_sap_date(cleaned[k])
-
-    # Convert numeric fields
-    for nf in ("NetAmount", "OrderQuantity", "NetPriceAmount", "GrossAmount", "AvailableQuantity"):
-        if nf in cleaned and isinstance(cleaned[nf], str):
+    if SAP_STRIP_ALL_DUNDER:
+        for k in [k for k in entry if k.startswith("__")]:
+            del entry[k]
+    else:
+        entry.pop("__metadata", None)
+        entry.pop("__deferred", None)
+
+    # Convert numeric fields (only those actually present)
+    for k in _NUMERIC_FIELDS & entry.keys():
+        v = entry[k]
+        if isinstance(v, str):
             try:
-                cleaned[nf] = float(cleaned[nf])
+                entry[k] = float(v)
             except Exception:
                 pass
 
-    return cleaned
+    # Format dates
+    for k, v in entry.items():
+        if isinstance(v, str) and _is_date_key(k):
+            entry[k] = _format_sap_date_str(v)
+
+    return entry
+
+_PO_HEADER_SELECT = [
+    "PurchaseOrder", "PurchasingOrganization", "PurchasingGroup",
+    "Supplier", "DocumentCurrency", "PurchaseOrderDate", "CreationDate"
+]
+_PO_HEADER_QUERY = _static_query(select=_PO_HEADER_SELECT, orderby="PurchaseOrderDate desc")
+_PO_HEADER_QUERY_UNORDERED = _static_query(select=_PO_HEADER_SELECT)
+
+def _query_purchase_orders(filter_str, limit, ordered=True):
+    """Fetch cleaned PO headers (newest first unless ordered=False); returns an error dict on failure"""
+    url = _build_url(
+        "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrder",
+        filters=filter_str,
+        top=limit,
+        static_query=_PO_HEADER_QUERY if ordered else _PO_HEADER_QUERY_UNORDERED
+    )
+
+    res = make_sap_request(url)
+    if res["status"] != "success":
+        return res
+
+    parsed = parse_json_entries(res["data"])
+    if "parse_error" in parsed:
+        return {"status": "error", "message": "Failed to parse response", "details": parsed}
+
+    return [_clean_entry(e) for e in parsed.get("entries", [])]
 
 # ============================================================================
 # TOOL 1: List Purchase Orders
 # ============================================================================
-def list_purchase_orders(limit=20, date_from=None, supplier=None, status=None):
+def list_purchase_orders(limit=20, date_from=None, supplier=None, status=None, _ordered=True):
     """
     List purchase orders with optional filters
 
@@ -166,12 +453,9 @@ def list_purchase_orders(limit=20, date_from=None, supplier=None, status=None):
         date_from: Filter orders from this date (YYYY-MM-DD format)
         supplier: Filter by supplier code
         status: Filter by order status
+        _ordered: Internal; False skips the server-side sort for callers that
+            re-index the orders anyway (not exposed as a tool parameter)
     """
-    select = [
-        "PurchaseOrder", "PurchasingOrganization", "PurchasingGroup",
-        "Supplier", "DocumentCurrency", "PurchaseOrderDate", "CreationDate"
-    ]
-
     filters = []
     if date_from:
         # Convert to SAP date format
@@ -181,23 +465,9 @@ def list_purchase_orders(limit=20, date_from=None, supplier=None, status=None):
 
     filter_str = " and ".join(filters) if filters else None
 
-    url = _build_url(
-        "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrder",
-        filters=filter_str,
-        select=select,
-        orderby="PurchaseOrderDate desc",
-        top=limit
-    )
-
-    res = make_sap_request(url)
-    if res["status"] != "success":
-        return res
-
-    parsed = parse_json_entries(res["data"])
-    if "parse_error" in parsed:
-        return {"status": "error", "message": "Failed to parse response", "details": parsed}
-
-    orders = [_clean_entry(e) for e in parsed.get("entries", [])]
+    orders = _query_purchase_orders(filter_str, limit, ordered=_ordered)
+    if isinstance(orders, dict):
+        return orders
 
     return {
         "status": "success",
@@ -214,28 +484,54 @@ def list_purchase_orders(limit=20, date_from=None, supplier=None, status=None):
 # ============================================================================
 # TOOL 2: Search Purchase Orders
 # ============================================================================
-def search_purchase_orders(search_term, search_field="all", limit=10):
+def search_purchase_orders(search_term="", search_field="all", limit=10):
     """
     Search purchase orders by various criteria
-    Uses client-side filtering since OData filters may not be supported on all entities
+    Pushes a substringof() filter to SAP; falls back to client-side filtering of
+    recent orders when the service rejects the filter or finds nothing (SAP's
+    substringof is case-sensitive, the client-side match is not)
 
     Args:
         search_term: Term to search for
         search_field: Field to search in (po_number, supplier, all)
         limit: Maximum number of results
     """
-    # Fetch orders without filters (more reliable than using OData filters)
-    # Fetch more than needed to ensure we have enough results after filtering
-    fetch_limit = min(limit * 10, 100)  # Fetch 10x limit but cap at 100
+    esc = search_term.replace("'", "''")
+    clauses = []
+    if search_field in ("po_number", "all"):
+        clauses.append(f"substringof('{esc}', PurchaseOrder)")
+    if search_field in ("supplier", "all"):
+        clauses.append(f"substringof('{esc}', Supplier)")
+
+    results = _query_purchase_orders(" or ".join(clauses), limit) if clauses else None
+    if isinstance(results, dict) and not _is_unsupported_query(results):
+        # Timeouts, 5xx and auth errors are reported, not retried as a scan
+        return results
+    if not results or isinstance(results, dict):
+        results = _search_purchase_orders_client_side(search_term, search_field, limit)
+        if isinstance(results, dict):
+            return results
 
-    all_orders = list_purchase_orders(limit=fetch_limit)
+    return {
+        "status": "success",
+        "search_results": results,
+        "total_orders": len(results),
+        "search_criteria": {
+            "search_term": search_term,
+            "search_field": search_field,
+            "limit": limit
+        }
+    }
 
-    if all_orders.get("status") != "success":
-        return all_orders
+def _search_purchase_orders_client_side(search_term, search_field, limit):
+    """Case-insensitive scan of recent orders; returns an error dict on failure"""
+    # Fetch more than needed to ensure we have enough results after filtering
+    fetch_limit = min(limit * 10, 100)  # Fetch 10x limit but cap at 100
 
-    orders = all_orders.get("purchase_orders", [])
+    orders = _query_purchase_orders(None, fetch_limit)
+    if isinstance(orders, dict):
+        return orders
 
-    # Client-side filtering
     search_term_lower = search_term.lower()
     results = []
 
@@ -256,20 +552,16 @@ def search_purchase_orders(search_term, search_field="all", limit=10):
             if len(results) >= limit:
                 break
 
-    return {
-        "status": "success",
-        "search_results": results,
-        "total_orders": len(results),
-        "search_criteria": {
-            "search_term": search_term,
-            "search_field": search_field,
-            "limit": limit
-        }
-    }
+    return results
 
 # ============================================================================
 # TOOL 3: Get Material Stock
 # ============================================================================
+_MATERIAL_STOCK_QUERY = _static_query(select=[
+    "Material", "Plant", "StorageLocation", "MaterialBaseUnit",
+    "MatlWrhsStkQtyInMatlBaseUnit", "InventoryStockType"
+])
+
 def get_material_stock(material_number=None, plant=None, low_stock_only=False, threshold=10):
     """
     Get material stock information
@@ -280,11 +572,6 @@ def get_material_stock(material_number=None, plant=None, low_stock_only=False, t
         low_stock_only: Only return items with low stock
         threshold: Stock threshold for low_stock_only filter
     """
-    select = [
-        "Material", "Plant", "StorageLocation", "MaterialBaseUnit",
-        "MatlWrhsStkQtyInMatlBaseUnit", "InventoryStockType"
-    ]
-
     filters = []
     if material_number:
         filters.append(f"Material eq '{material_number}'")
@@ -299,12 +586,12 @@ def get_material_stock(material_number=None, plant=None, low_stock_only=False, t
     url = _build_url(
         "/sap/opu/odata/sap/API_MATERIAL_STOCK_SRV/A_MatlStkInAcctMod",
         filters=filter_str,
-        select=select,
-        orderby=None,  # Remove orderby to avoid issues
-        top=200  # Increase limit to get more materials
+        top=200,  # Increase limit to get more materials
+        static_query=_MATERIAL_STOCK_QUERY  # no orderby, to avoid issues
     )
 
-    res = make_sap_request(url)
+    # Low-stock checks should always see current quantities
+    res = make_sap_request(url, cache=not low_stock_only)
     if res["status"] != "success":
         # Fallback message if stock API is not available
         return {
@@ -355,6 +642,9 @@ def get_material_stock(material_number=None, plant=None, low_stock_only=False, t
 # ============================================================================
 # TOOL 4: Get Material In-Transit Quantities (INVENTORY-FOCUSED)
 # ============================================================================
+# No $select: it must stay off to access the IsCompletelyDelivered field
+_IN_TRANSIT_QUERY = _static_query(orderby="PurchaseOrder desc")
+
 def get_material_in_transit(material_number=None, limit=200):
     """
     Get materials with quantities in transit (not yet delivered)
@@ -372,56 +662,50 @@ def get_material_in_transit(material_number=None, limit=200):
     # Query WITHOUT $select to avoid 404 errors with delivery status fields
     url = _build_url(
         "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
-        filters=None,
-        select=None,  # Must be None to access IsCompletelyDelivered field
-        orderby="PurchaseOrder desc",
-        top=limit
+        top=limit,
+        static_query=_IN_TRANSIT_QUERY
     )
 
     res = make_sap_request(url)
     if res["status"] != "success":
         return res
 
-    parsed = parse_json_entries(res["data"])
-    if "parse_error" in parsed:
-        return {"status": "error", "message": "Failed to parse response", "details": parsed}
-
-    all_items = [_clean_entry(e) for e in parsed.get("entries", [])]
-
-    # Filter for NOT completely delivered items
-    in_transit_items = [
-        item for item in all_items
-        if item.get('IsCompletelyDelivered') == False
-    ]
-
-    # Filter by material if specified
     if material_number:
         material_number = material_number.strip().lstrip('0')
-        in_transit_items = [
-            item for item in in_transit_items
-            if item.get('Material', '').strip().lstrip('0') == material_number
-        ]
 
-    # Group by MATERIAL (inventory-focused)
+    # Single pass over the entries: clean, keep only NOT completely
+    # delivered items (optionally of one material) and group by MATERIAL
+    # (inventory-focused)
     by_material = {}
-    for item in in_transit_items:
-        mat = item.get('Material')
-        if mat not in by_material:
-            by_material[mat] = {
-                'material': mat,
-                'total_in_transit_qty': 0,
-                'unit': item.get('PurchaseOrderQuantityUnit'),
-                'related_orders': []
-            }
+    try:
+        for item in map(_clean_entry, iter_json_entries(res["data"])):
+            get = item.get
+            if get('IsCompletelyDelivered') != False:
+                continue
+            if material_number and get('Material', '').strip().lstrip('0') != material_number:
+                continue
 
-        qty = float(item.get('OrderQuantity', 0))
-        by_material[mat]['total_in_transit_qty'] += qty
-        by_material[mat]['related_orders'].append({
-            'purchase_order': item.get('PurchaseOrder'),
-            'item': item.get('PurchaseOrderItem'),
-            'quantity': qty,
-            'is_invoiced': item.get('IsFinallyInvoiced')
-        })
+            mat = get('Material')
+            bucket = by_material.get(mat)
+            if bucket is None:
+                bucket = by_material[mat] = {
+                    'material': mat,
+                    'total_in_transit_qty': 0,
+                    'unit': get('PurchaseOrderQuantityUnit'),
+                    'related_orders': []
+                }
+
+            qty = float(get('OrderQuantity', 0))
+            bucket['total_in_transit_qty'] += qty
+            bucket['related_orders'].append({
+                'purchase_order': get('PurchaseOrder'),
+                'item': get('PurchaseOrderItem'),
+                'quantity': qty,
+                'is_invoiced': get('IsFinallyInvoiced')
+            })
+    except ValueError as e:
+        parsed = {"parse_error": str(e), "raw_json_preview": _preview(res["data"])}
+        return {"status": "error", "message": "Failed to parse response", "details": parsed}
 
     materials_in_transit = list(by_material.values())
 
@@ -435,6 +719,22 @@ def get_material_in_transit(material_number=None, limit=200):
 # ============================================================================
 # TOOL 5: Get Orders in Transit/Delivery (ORDER-FOCUSED)
 # ============================================================================
+# Capability cache for server-side filters some SAP systems reject on an entity
+_SERVER_FILTER_SUPPORTED = {}
+
+def _is_unsupported_query(res):
+    return res["status"] != "success" and res.get("message", "").startswith(("HTTP Error 400", "HTTP Error 501"))
+
+def _orders_in_transit_url(limit, server_filter):
+    return _build_url(
+        "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
+        filters="IsCompletelyDelivered eq false" if server_filter else None,
+        static_query=_IN_TRANSIT_QUERY,
+        # Every row is in transit when SAP filters, so limit*5 items covers
+        # multi-item orders; otherwise check more items to find pending ones
+        top=limit * 5 if server_filter else 200
+    )
+
 def get_orders_in_transit(limit=20):
     """
     Get purchase orders that have items in transit (not yet completely delivered)
@@ -450,53 +750,53 @@ def get_orders_in_transit(limit=20):
     - Total items
     - List of materials pending delivery
     """
-    # Query items WITHOUT $select to access IsCompletelyDelivered field
-    url = _build_url(
-        "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
-        filters=None,
-        select=None,  # Must be None to access IsCompletelyDelivered field
-        orderby="PurchaseOrder desc",
-        top=200  # Check more items to find orders with pending deliveries
-    )
-
-    res = make_sap_request(url)
+    # Query items WITHOUT $select to access IsCompletelyDelivered field.
+    # Prefer letting SAP drop delivered items ($filter); systems that reject the
+    # filter on this entity get the client-side path, remembered per container.
+    server_filter = _SERVER_FILTER_SUPPORTED.get("orders_in_transit", True)
+    res = make_sap_request(_orders_in_transit_url(limit, server_filter))
+    if server_filter and _is_unsupported_query(res):
+        _SERVER_FILTER_SUPPORTED["orders_in_transit"] = False
+        res = make_sap_request(_orders_in_transit_url(limit, False))
     if res["status"] != "success":
         return res
 
-    parsed = parse_json_entries(res["data"])
-    if "parse_error" in parsed:
-        return {"status": "error", "message": "Failed to parse response", "details": parsed}
-
-    all_items = [_clean_entry(e) for e in parsed.get("entries", [])]
-
-    # Filter for NOT completely delivered items
-    in_transit_items = [
-        item for item in all_items
-        if item.get('IsCompletelyDelivered') == False
-    ]
-
-    # Group by PURCHASE ORDER (order-focused)
+    # Single pass over the entries: clean, keep only NOT completely
+    # delivered items and group by PURCHASE ORDER (order-focused)
     by_order = {}
-    for item in in_transit_items:
-        po = item.get('PurchaseOrder')
-        if po not in by_order:
-            by_order[po] = {
-                'purchase_order': po,
-                'supplier': item.get('Supplier'),
-                'currency': item.get('DocumentCurrency'),
-                'items_in_transit': [],
-                'total_in_transit_items': 0
-            }
+    try:
+        for item in map(_clean_entry, iter_json_entries(res["data"])):
+            get = item.get
+            if get('IsCompletelyDelivered') != False:
+                continue
 
-        by_order[po]['items_in_transit'].append({
-            'item': item.get('PurchaseOrderItem'),
-            'material': item.get('Material'),
-            'material_description': item.get('PurchaseOrderItemText'),
-            'quantity': float(item.get('OrderQuantity', 0)),
-            'unit': item.get('PurchaseOrderQuantityUnit'),
-            'is_invoiced': item.get('IsFinallyInvoiced')
-        })
-        by_order[po]['total_in_transit_items'] += 1
+            po = get('PurchaseOrder')
+            bucket = by_order.get(po)
+            if bucket is None:
+                # Items arrive ordered by PurchaseOrder, so once `limit` orders are
+                # collected a new PO means every remaining item is past the limit
+                if len(by_order) >= limit:
+                    break
+                bucket = by_order[po] = {
+                    'purchase_order': po,
+                    'supplier': get('Supplier'),
+                    'currency': get('DocumentCurrency'),
+                    'items_in_transit': [],
+                    'total_in_transit_items': 0
+                }
+
+            bucket['items_in_transit'].append({
+                'item': get('PurchaseOrderItem'),
+                'material': get('Material'),
+                'material_description': get('PurchaseOrderItemText'),
+                'quantity': float(get('OrderQuantity', 0)),
+                'unit': get('PurchaseOrderQuantityUnit'),
+                'is_invoiced': get('IsFinallyInvoiced')
+            })
+            bucket['total_in_transit_items'] += 1
+    except ValueError as e:
+        parsed = {"parse_error": str(e), "raw_json_preview": _preview(res["data"])}
+        return {"status": "error", "message": "Failed to parse response", "details": parsed}
 
     orders_in_transit = list(by_order.values())
 
@@ -513,6 +813,13 @@ def get_orders_in_transit(limit=20):
 # ============================================================================
 # TOOL 5: Get Goods Receipts (Material Documents)
 # ============================================================================
+_GOODS_RECEIPT_QUERY = _static_query(select=[
+    "MaterialDocument", "MaterialDocumentYear", "MaterialDocumentItem",
+    "Material", "Plant", "StorageLocation", "GoodsMovementType",
+    "QuantityInEntryUnit", "EntryUnit", "PurchaseOrder", "PurchaseOrderItem",
+    "PostingDate", "DocumentDate", "MaterialDocumentHeaderText"
+])
+
 def get_goods_receipts(po_number=None, material_number=None, limit=50):
     """
     Get goods receipt information from Material Documents API
@@ -523,13 +830,6 @@ def get_goods_receipts(po_number=None, material_number=None, limit=50):
         material_number: Filter by material number
         limit: Maximum number of records to return
     """
-    select = [
-        "MaterialDocument", "MaterialDocumentYear", "MaterialDocumentItem",
-        "Material", "Plant", "StorageLocation", "GoodsMovementType",
-        "QuantityInEntryUnit", "EntryUnit", "PurchaseOrder", "PurchaseOrderItem",
-        "PostingDate", "DocumentDate", "MaterialDocumentHeaderText"
-    ]
-
     filters = []
     # Filter for goods receipts (movement type 101)
     filters.append("GoodsMovementType eq '101'")
@@ -547,9 +847,8 @@ def get_goods_receipts(po_number=None, material_number=None, limit=50):
     url = _build_url(
         "/sap/opu/odata/sap/API_MATERIAL_DOCUMENT_SRV/A_MaterialDocumentItem",
         filters=filter_str,
-        select=select,
-        orderby=None,  # Remove orderby to avoid potential issues
-        top=limit
+        top=limit,
+        static_query=_GOODS_RECEIPT_QUERY  # no orderby, to avoid potential issues
     )
 
     res = make_sap_request(url)
@@ -565,10 +864,12 @@ def get_goods_receipts(po_number=None, material_number=None, limit=50):
     if "parse_error" in parsed:
         return {"status": "error", "message": "Failed to parse response", "details": parsed}
 
-    receipts = [_clean_entry(e) for e in parsed.get("entries", [])]
-
-    # Calculate summary
-    total_received = sum(item.get("QuantityInEntryUnit", 0) for item in receipts)
+    # Clean and sum in one pass over the entries
+    receipts = []
+    total_received = 0
+    for item in map(_clean_entry, parsed.get("entries", [])):
+        receipts.append(item)
+        total_received += item.get("QuantityInEntryUnit", 0)
 
     return {
         "status": "success",
@@ -585,7 +886,7 @@ def get_goods_receipts(po_number=None, material_number=None, limit=50):
 # ============================================================================
 # TOOL 6: Get Open Purchase Orders (simplified for demo system)
 # ============================================================================
-def get_open_purchase_orders(limit=50):
+def get_open_purchase_orders(limit=50, _ordered=True):
     """
     Get recent purchase orders (potentially open orders)
 
@@ -595,9 +896,10 @@ def get_open_purchase_orders(limit=50):
 
     Args:
         limit: Maximum number of orders to return
+        _ordered: Internal; passed through to list_purchase_orders
     """
     # Get recent purchase orders (these are likely still open)
-    po_result = list_purchase_orders(limit=limit)
+    po_result = list_purchase_orders(limit=limit, _ordered=_ordered)
 
     if po_result.get("status") != "success":
         return {
@@ -640,6 +942,27 @@ def get_open_purchase_orders(limit=50):
 # ============================================================================
 # TOOL 7: Get Inventory with Open Orders
 # ============================================================================
+# For each open PO, get its items
+# Use the same select field variants as get_complete_po_data.py (fallback mechanism)
+_INVENTORY_ITEM_QUERIES = tuple(
+    _static_query(select=sel, orderby="PurchaseOrderItem asc") for sel in (
+        ["PurchaseOrder", "PurchaseOrderItem", "Material", "PurchaseOrderItemText",
+         "OrderQuantity", "PurchaseOrderQuantityUnit"],
+        ["PurchaseOrder", "PurchaseOrderItem", "Material", "MaterialDescription",
+         "OrderQuantity", "PurchaseOrderQuantityUnit"],
+        ["PurchaseOrder", "PurchaseOrderItem", "Material",
+         "OrderQuantity", "PurchaseOrderQuantityUnit"]
+    )
+)
+
+def _inventory_with_orders_result(inventory_with_orders):
+    return {
+        "status": "success",
+        "inventory_with_open_orders": inventory_with_orders,
+        "total_materials": len(inventory_with_orders),
+        "note": "These materials have both current stock and pending purchase orders"
+    }
+
 def get_inventory_with_open_orders(threshold=10):
     """
     Cross-reference inventory stock with open purchase orders
@@ -648,8 +971,12 @@ def get_inventory_with_open_orders(threshold=10):
     Args:
         threshold: Minimum stock threshold to consider
     """
-    # Get stock info
-    stock_res = get_material_stock(low_stock_only=False)
+    # Stock and open orders are independent queries, so fetch them together
+    stock_res, orders_res = fetch_parallel(
+        functools.partial(get_material_stock, low_stock_only=False),
+        # Only re-indexed by material below, so SAP needn't sort the orders
+        functools.partial(get_open_purchase_orders, limit=100, _ordered=False)
+    )
     if stock_res.get("status") != "success":
         return {
             "status": "partial",
@@ -662,8 +989,7 @@ def get_inventory_with_open_orders(threshold=10):
     # Build map of materials in stock
     stock_materials = {item.get("Material"): item for item in stock_items}
 
-    # Get open purchase orders (which includes PO numbers)
-    orders_res = get_open_purchase_orders(limit=100)
+    # Open purchase orders (which includes PO numbers)
     if orders_res.get("status") != "success":
         return {
             "status": "partial",
@@ -671,34 +997,27 @@ def get_inventory_with_open_orders(threshold=10):
             "inventory_with_orders": []
         }
 
-    # For each open PO, get its items
-    # Use the same select field variants as get_complete_po_data.py (fallback mechanism)
-    select_variants = [
-        ["PurchaseOrder", "PurchaseOrderItem", "Material", "PurchaseOrderItemText",
-         "OrderQuantity", "PurchaseOrderQuantityUnit"],
-        ["PurchaseOrder", "PurchaseOrderItem", "Material", "MaterialDescription",
-         "OrderQuantity", "PurchaseOrderQuantityUnit"],
-        ["PurchaseOrder", "PurchaseOrderItem", "Material",
-         "OrderQuantity", "PurchaseOrderQuantityUnit"]
-    ]
+    open_orders = orders_res.get("open_purchase_orders", [])
+    if not stock_materials or not open_orders:
+        # Nothing to probe with, or nothing to find: skip the per-PO item fetches
+        return _inventory_with_orders_result([])
 
-    # Collect all PO items from all open orders
-    all_po_items = []
-    open_orders = orders_res.get("open_orders", [])
+    # Index PO items by material (the build side of the join) as they arrive
+    material_orders = defaultdict(list)
 
     for order in open_orders:
-        po_number = order.get("PurchaseOrder")
+        po_number = order.get("purchase_order")
         if not po_number:
             continue
+        supplier = order.get("supplier")  # Add supplier from header
 
-        # Try to get items for this PO using fallback mechanism
-        items_retrieved = False
-        for sel in select_variants:
+        # Try to get items for this PO using fallback mechanism; if none of
+        # the variants works, the PO is skipped
+        for item_query in _INVENTORY_ITEM_QUERIES:
             url = _build_url(
                 "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
                 filters=f"PurchaseOrder eq '{po_number}'",
-                select=sel,
-                orderby="PurchaseOrderItem asc"
+                static_query=item_query
             )
 
             res = make_sap_request(url)
@@ -706,38 +1025,23 @@ def get_inventory_with_open_orders(threshold=10):
                 parsed = parse_json_entries(res["data"])
                 if "entries" in parsed:
                     for entry in parsed.get("entries", []):
-                        cleaned = _clean_entry(entry)
-                        cleaned["Supplier"] = order.get("Supplier")  # Add supplier from header
-                        all_po_items.append(cleaned)
-                    items_retrieved = True
+                        item = _clean_entry(entry)
+                        material = item.get("Material")
+                        if not material:
+                            continue
+                        material_orders[material].append({
+                            "purchase_order": item.get("PurchaseOrder"),
+                            "supplier": supplier,
+                            "order_quantity": item.get("OrderQuantity", 0),
+                            "unit": item.get("PurchaseOrderQuantityUnit")
+                        })
                     break
 
-        if not items_retrieved:
-            # If we can't get items for this PO, skip it
-            continue
-
-    # Build material->orders map from collected PO items
-    material_orders = {}
-    for item in all_po_items:
-        material = item.get("Material")
-        if not material:
-            continue
-
-        if material not in material_orders:
-            material_orders[material] = []
-
-        material_orders[material].append({
-            "purchase_order": item.get("PurchaseOrder"),
-            "supplier": item.get("Supplier"),
-            "order_quantity": item.get("OrderQuantity", 0),
-            "unit": item.get("PurchaseOrderQuantityUnit")
-        })
-
-    # Cross-reference: materials with stock AND open orders
+    # Cross-reference (probe with stock): materials with stock AND open orders
     inventory_with_orders = []
     for material, stock_item in stock_materials.items():
-        if material in material_orders:
-            open_orders = material_orders[material]
+        open_orders = material_orders.get(material)
+        if open_orders:
             total_open_qty = sum(o["order_quantity"] for o in open_orders)
 
             inventory_with_orders.append({
@@ -752,16 +1056,82 @@ def get_inventory_with_open_orders(threshold=10):
                 "open_orders": open_orders
             })
 
-    return {
-        "status": "success",
-        "inventory_with_open_orders": inventory_with_orders,
-        "total_materials": len(inventory_with_orders),
-        "note": "These materials have both current stock and pending purchase orders"
-    }
+    return _inventory_with_orders_result(inventory_with_orders)
 
 # ============================================================================
 # TOOL 8: Get Orders Awaiting Invoice or Delivery
 # ============================================================================
+# Keep field list short to avoid URL length issues (SAP has ~290 char limit max)
+_AWAITING_DETAIL_QUERY = _static_query(
+    select=[
+        "PurchaseOrder", "PurchaseOrderItem", "Material",
+        "OrderQuantity", "PurchaseOrderQuantityUnit",
+        "IsCompletelyDelivered", "IsFinallyInvoiced"
+    ],
+    orderby="PurchaseOrder desc"
+)
+_AWAITING_ANALYSIS_QUERY = _static_query(
+    select=["PurchaseOrder", "IsCompletelyDelivered", "IsFinallyInvoiced"],
+    orderby="PurchaseOrder desc"
+)
+
+# Count queries for: all items, both pending, not delivered only, not invoiced
+# only (the order get_orders_awaiting_invoice_or_delivery unpacks them in)
+_AWAITING_COUNT_FILTERS = (
+    None,
+    "IsCompletelyDelivered eq false and IsFinallyInvoiced eq false",
+    "IsCompletelyDelivered eq false and IsFinallyInvoiced eq true",
+    "IsCompletelyDelivered eq true and IsFinallyInvoiced eq false",
+)
+_COUNT_QUERY = "&%24inlinecount=allpages&%24top=0"
+
+def _count_url(filter_str):
+    return _build_url(
+        "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
+        filters=filter_str,
+        static_query=_COUNT_QUERY
+    )
+
+def _parse_count(res):
+    """__count of an $inlinecount response, or None"""
+    if res["status"] != "success":
+        return None
+    try:
+        return int(_json_loads(res["data"])["d"]["__count"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _analyze_sample(res):
+    """Fold the 300-row analysis sample into (size, not_delivered, not_invoiced, both, po_set).
+
+    Only three flags are read, so the entries go straight into counters
+    without being cleaned.
+    """
+    if res["status"] != "success":
+        return 0, 0, 0, 0, set()
+    sample_size = 0
+    total_not_delivered = 0
+    total_not_invoiced = 0
+    total_both_pending = 0
+    po_numbers_with_issues = set()
+    try:
+        for item in iter_json_entries(res["data"]):
+            sample_size += 1
+            is_delivered = item.get("IsCompletelyDelivered") in _TRUTHY
+            is_invoiced = item.get("IsFinallyInvoiced") in _TRUTHY
+
+            if not is_delivered and not is_invoiced:
+                total_both_pending += 1
+                po_numbers_with_issues.add(item.get("PurchaseOrder", ""))
+            elif not is_delivered:
+                total_not_delivered += 1
+            elif not is_invoiced:
+                total_not_invoiced += 1
+    except ValueError:
+        # Unparseable analysis body: report no sample
+        return 0, 0, 0, 0, set()
+    return sample_size, total_not_delivered, total_not_invoiced, total_both_pending, po_numbers_with_issues
+
 def get_orders_awaiting_invoice_or_delivery(limit=100, filter_type="all"):
     """
     Get purchase order items that are not fully delivered or not invoiced
@@ -771,59 +1141,88 @@ def get_orders_awaiting_invoice_or_delivery(limit=100, filter_type="all"):
         limit: Maximum number of items to return
         filter_type: Filter by status - "not_delivered", "not_invoiced", or "all"
     """
-    # Keep field list short to avoid URL length issues (SAP has ~290 char limit max)
-    select = [
-        "PurchaseOrder", "PurchaseOrderItem", "Material",
-        "OrderQuantity", "PurchaseOrderQuantityUnit",
-        "IsCompletelyDelivered", "IsFinallyInvoiced"
-    ]
-
     # Build filter based on delivery and invoice status
-    # Note: For "all" we just get recent items and filter in code since SAP OData
-    # has limited support for complex OR filters
+    # Note: For "all" SAP is asked for either flag being open; gateways that
+    # reject the OR filter get recent items filtered in code, remembered per
+    # container (the categorizing below drops completed items either way)
+    or_filter = filter_type not in ("not_delivered", "not_invoiced") and _SERVER_FILTER_SUPPORTED.get("awaiting_or", True)
     filters = []
     if filter_type == "not_delivered":
         filters.append("IsCompletelyDelivered eq false")
     elif filter_type == "not_invoiced":
         filters.append("IsFinallyInvoiced eq false")
-    # For "all" type, don't add filter - we'll filter in code
+    elif or_filter:
+        filters.append("(IsCompletelyDelivered eq false or IsFinallyInvoiced eq false)")
 
     filter_str = " and ".join(filters) if filters else None
 
-    # FIRST: Fetch a larger dataset (300 items) with minimal fields to get full context
-    # We need this to accurately report "X out of Y total" and identify patterns
+    # FIRST (fallback when count queries are unavailable): Fetch a larger dataset
+    # (300 items) with minimal fields to report "X out of Y total" and patterns
     # NOTE: Keep fields minimal to avoid SAP URL length limit (~250 chars max)
     # SAP rejects requests with Supplier field at top=500, so using top=300 and 3 fields only
     analysis_url = _build_url(
         "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
         filters=None,  # Get all items, filter in code
-        select=["PurchaseOrder", "IsCompletelyDelivered", "IsFinallyInvoiced"],
-        orderby="PurchaseOrder desc",
-        top=300  # Max that works reliably with SAP URL limits
+        top=300,  # Max that works reliably with SAP URL limits
+        static_query=_AWAITING_ANALYSIS_QUERY
     )
 
-    analysis_res = make_sap_request(analysis_url, timeout=60, retries=2)
-    total_items_in_system = 0
-    all_items_sample = []
-
-    if analysis_res["status"] == "success":
-        parsed_analysis = parse_json_entries(analysis_res["data"])
-        all_items_sample = [_clean_entry(e) for e in parsed_analysis.get("entries", [])]
-        total_items_in_system = len(all_items_sample)
-        # If we got 300, there may be more - note this in response
-        if total_items_in_system == 300:
-            total_items_in_system = "300+"  # Indicate there are more
-
     # SECOND: Get detailed data for the items we'll show to user (with full fields)
     url = _build_url(
         "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
         filters=filter_str,
-        select=select,
-        orderby="PurchaseOrder desc",
-        top=limit
+        top=limit,
+        static_query=_AWAITING_DETAIL_QUERY
     )
 
-    res = make_sap_request(url, timeout=45, retries=2)
+    # Category totals come from count-only queries ($inlinecount, no rows)
+    # where the gateway supports them; otherwise from the 300-row sample
+    use_counts = _SERVER_FILTER_SUPPORTED.get("inlinecount", True)
+    if use_counts:
+        analysis_urls = [_count_url(f) for f in _AWAITING_COUNT_FILTERS]
+    else:
+        analysis_urls = [analysis_url]
+
+    # All queries hit I_PurchaseOrderItem, so they can share one $batch round-trip
+    urls = analysis_urls + [url]
+    results = _odata_batch(urls) if SAP_USE_BATCH else None
+    if not results:
+        results = fetch_parallel(*(
+            functools.partial(make_sap_request, u, timeout=45 if u is url else 60, retries=2)
+            for u in urls
+        ))
+    *analysis_results, res = results
+    if or_filter and _is_unsupported_query(res):
+        _SERVER_FILTER_SUPPORTED["awaiting_or"] = False
+        url = _build_url(
+            "/sap/opu/odata/sap/C_PURCHASEORDER_FS_SRV/I_PurchaseOrderItem",
+            top=limit,
+            static_query=_AWAITING_DETAIL_QUERY
+        )
+        res = make_sap_request(url, timeout=45, retries=2)
+
+    counts = [_parse_count(r) for r in analysis_results] if use_counts else None
+    if counts and None in counts:
+        if any(_is_unsupported_query(r) or (r["status"] == "success" and _parse_count(r) is None)
+               for r in analysis_results):
+            # Rejected, or answered without __count: don't try again in this
+            # container. A transport failure only falls back for this call
+            _SERVER_FILTER_SUPPORTED["inlinecount"] = False
+        counts = None
+        analysis_results = [make_sap_request(analysis_url, timeout=60, retries=2)]
+
+    if counts:
+        total_items_in_system, total_both_pending, total_not_delivered, total_not_invoiced = counts
+        sample_size = total_items_in_system
+        po_numbers_with_issues = None  # taken from the detailed items below
+    else:
+        sample_size, total_not_delivered, total_not_invoiced, total_both_pending, po_numbers_with_issues = \
+            _analyze_sample(analysis_results[0])
+        total_items_in_system = sample_size
+        # If we got 300, there may be more - note this in response
+        if total_items_in_system == 300:
+            total_items_in_system = "300+"  # Indicate there are more
+
     if res["status"] != "success":
         return {
             "status": "error",
@@ -839,35 +1238,16 @@ def get_orders_awaiting_invoice_or_delivery(limit=100, filter_type="all"):
             "details": parsed
         }
 
-    items = [_clean_entry(e) for e in parsed.get("entries", [])]
-
-    # Analyze the FULL sample (300 items) to get accurate counts and patterns
-    total_not_delivered = 0
-    total_not_invoiced = 0
-    total_both_pending = 0
-    po_numbers_with_issues = set()
-
-    for item in all_items_sample:
-        is_delivered = item.get("IsCompletelyDelivered") in [True, "true", "X"]
-        is_invoiced = item.get("IsFinallyInvoiced") in [True, "true", "X"]
-        po_number = item.get("PurchaseOrder", "")
-
-        if not is_delivered and not is_invoiced:
-            total_both_pending += 1
-            po_numbers_with_issues.add(po_number)
-        elif not is_delivered:
-            total_not_delivered += 1
-        elif not is_invoiced:
-            total_not_invoiced += 1
-
-    # Categorize detailed items to show user (from limited query)
+    # Categorize detailed items to show user (from limited query), cleaning
+    # each entry as it is categorized
+    entries = parsed.get("entries", [])
     not_delivered = []
     not_invoiced = []
     both_pending = []
 
-    for item in items:
-        is_delivered = item.get("IsCompletelyDelivered") in [True, "true", "X"]
-        is_invoiced = item.get("IsFinallyInvoiced") in [True, "true", "X"]
+    for item in map(_clean_entry, entries):
+        is_delivered = item.get("IsCompletelyDelivered") in _TRUTHY
+        is_invoiced = item.get("IsFinallyInvoiced") in _TRUTHY
 
         item_data = {
             "purchase_order": item.get("PurchaseOrder"),
@@ -886,17 +1266,21 @@ def get_orders_awaiting_invoice_or_delivery(limit=100, filter_type="all"):
         elif not is_invoiced:
             not_invoiced.append(item_data)
 
-    # Pattern analysis from full sample
+    if po_numbers_with_issues is None:
+        po_numbers_with_issues = {item["purchase_order"] or "" for item in both_pending}
+
+    # Pattern analysis from full sample (or the detailed items, with counts)
     patterns = {
-        "unique_po_numbers": sorted(list(po_numbers_with_issues))[:15],  # Show first 15 POs
+        # Show first 15 POs; the set itself is still needed for the unique count
+        "unique_po_numbers": heapq.nsmallest(15, po_numbers_with_issues),
         "total_unique_pos": len(po_numbers_with_issues),
-        "percentage_with_issues": round(total_both_pending/len(all_items_sample)*100 if len(all_items_sample) > 0 else 0, 1)
+        "percentage_with_issues": round(total_both_pending/sample_size*100 if sample_size > 0 else 0, 1)
     }
 
     return {
         "status": "success",
         "total_items_in_system": total_items_in_system,
-        "items_analyzed_for_detailed_view": len(items),
+        "items_analyzed_for_detailed_view": len(entries),
         "items_awaiting_delivery": not_delivered,
         "items_awaiting_invoice": not_invoiced,
         "items_awaiting_both": both_pending,
@@ -907,12 +1291,56 @@ def get_orders_awaiting_invoice_or_delivery(limit=100, filter_type="all"):
             "total_both_pending": total_both_pending,
             "patterns": patterns
         },
-        "note": f"Analyzed {len(all_items_sample)} items from the system. Found {total_both_pending} items ({round(total_both_pending/len(all_items_sample)*100 if len(all_items_sample) > 0 else 0, 1)}%) with neither delivery nor invoice."
+        "note": f"{'Counted' if counts else 'Analyzed'} {sample_size} items from the system. Found {total_both_pending} items ({round(total_both_pending/sample_size*100 if sample_size > 0 else 0, 1)}%) with neither delivery nor invoice."
     }
 
 # ============================================================================
 # Lambda Handler
 # ============================================================================
+def _tool_spec(fn):
+    """(callable, [(param, default, coerce)]) from the tool's signature"""
+    schema = []
+    for name, param in inspect.signature(fn).parameters.items():
+        if name.startswith("_"):
+            continue  # internal knobs are not tool parameters
+        default = param.default
+        # Numeric params arrive as strings from the Gateway; bools pass through
+        coerce = int if type(default) is int else None
+        schema.append((name, default, coerce))
+    return fn, schema
+
+_TOOLS = {fn.__name__: _tool_spec(fn) for fn in (
+    list_purchase_orders,
+    search_purchase_orders,
+    get_material_stock,
+    get_material_in_transit,
+    get_orders_in_transit,
+    get_goods_receipts,
+    get_open_purchase_orders,
+    get_inventory_with_open_orders,
+    get_orders_awaiting_invoice_or_delivery
+)}
+
+def _invoke_tool(tool_name, params):
+    """Route a tool call to its implementation"""
+    spec = _TOOLS.get(tool_name)
+    if spec is None:
+        return {
+            "status": "error",
+            "message": f"Unknown tool: {tool_name}",
+            "available_tools": list(_TOOLS)
+        }
+    fn, schema = spec
+    kwargs = {}
+    for name, default, coerce in schema:
+        value = params.get(name, default)
+        kwargs[name] = coerce(value) if coerce is not None else value
+    return fn(**kwargs)
+
+def _result_summary(result):
+    """Item counts of a tool result's list fields, for INFO logging"""
+    return " ".join(f"{k}={len(v)}" for k, v in result.items() if isinstance(v, list))
+
 def lambda_handler(event, context):
     """Handle MCP tool invocations from AgentCore Gateway
 
@@ -920,8 +1348,10 @@ def lambda_handler(event, context):
     - event: A flat dict of tool parameters (e.g., {"limit": 20, "status": "open"})
     - context: Contains bedrockAgentCoreToolName in format "target-name___tool-name"
     """
-    logger.info("event=%s", json.dumps(event))
-    logger.info("context=%s", str(context))
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("event=%s", _json_dumps(event))
+        logger.debug("context=%s", context)
 
     try:
         # Extract tool name from context (AgentCore Gateway format)
@@ -945,78 +1375,29 @@ def lambda_handler(event, context):
         # Parameters are passed directly in the event as a flat dict
         params = event
 
-        logger.info(f"Tool: {tool_name}, Params: {params}")
+        if debug:
+            logger.debug("tool=%s params=%s", tool_name, params)
 
-        # Route to appropriate tool
-        result = None
-        if tool_name == "list_purchase_orders":
-            result = list_purchase_orders(
-                limit=int(params.get("limit", 20)),
-                date_from=params.get("date_from"),
-                supplier=params.get("supplier"),
-                status=params.get("status")
-            )
-        elif tool_name == "search_purchase_orders":
-            result = search_purchase_orders(
-                search_term=params.get("search_term", ""),
-                search_field=params.get("search_field", "all"),
-                limit=int(params.get("limit", 10))
-            )
-        elif tool_name == "get_material_stock":
-            result = get_material_stock(
-                material_number=params.get("material_number"),
-                plant=params.get("plant"),
-                low_stock_only=params.get("low_stock_only", False),
-                threshold=int(params.get("threshold", 10))
-            )
-        elif tool_name == "get_material_in_transit":
-            result = get_material_in_transit(
-                material_number=params.get("material_number"),
-                limit=int(params.get("limit", 200))
-            )
-        elif tool_name == "get_orders_in_transit":
-            result = get_orders_in_transit(
-                limit=int(params.get("limit", 20))
-            )
-        elif tool_name == "get_goods_receipts":
-            result = get_goods_receipts(
-                po_number=params.get("po_number"),
-                material_number=params.get("material_number"),
-                limit=int(params.get("limit", 50))
-            )
-        elif tool_name == "get_open_purchase_orders":
-            result = get_open_purchase_orders(
-                limit=int(params.get("limit", 50))
-            )
-        elif tool_name == "get_inventory_with_open_orders":
-            result = get_inventory_with_open_orders(
-                threshold=int(params.get("threshold", 10))
-            )
-        elif tool_name == "get_orders_awaiting_invoice_or_delivery":
-            result = get_orders_awaiting_invoice_or_delivery(
-                limit=int(params.get("limit", 100)),
-                filter_type=params.get("filter_type", "all")
-            )
-        else:
+        # {"fresh": true} forces every SAP read in this call past the response cache
+        if params.get("fresh") in (True, "true", "True", "1"):
+            _cache_clear()
+
+        if isinstance(params.get("batch"), list):
+            # Several tool calls in one Gateway invocation, e.g.
+            # {"batch": [{"tool": "list_purchase_orders", "limit": 5}, {"tool": "get_orders_in_transit"}]}
             result = {
-                "status": "error",
-                "message": f"Unknown tool: {tool_name}",
-                "available_tools": [
-                    "list_purchase_orders",
-                    "search_purchase_orders",
-                    "get_material_stock",
-                    "get_material_in_transit",
-                    "get_orders_in_transit",
-                    "get_goods_receipts",
-                    "get_open_purchase_orders",
-                    "get_inventory_with_open_orders",
-                    "get_orders_awaiting_invoice_or_delivery"
-                ]
+                "status": "success",
+                "results": [_invoke_tool(call.get("tool", ""), call) for call in params.get("batch", [])]
             }
+        else:
+            result = _invoke_tool(tool_name, params)
 
         # For AgentCore Gateway, simply return the result dict
         # The Gateway handles the wrapping and formatting
-        logger.info("response=%s", json.dumps(result))
+        if debug:
+            logger.debug("response=%s", _json_dumps(result))
+        else:
+            logger.info("tool=%s status=%s %s", tool_name, result.get("status"), _result_summary(result))
         return result
 
     except Exception as e:
@@ -1027,7 +1408,7 @@ def lambda_handler(event, context):
             "error": str(e),
             "error_type": type(e).__name__
         }
-        logger.error("error=%s", json.dumps(error_response))
+        logger.error("error=%s", _json_dumps(error_response))
         return error_response
 
 if __name__ == "__main__":
@@ -32,14 +32,18 @@ echo "ECR Repository: ${ECR_URL}"
 cd ..
 
 # Step 2: Build Docker image
+# The ECR login is independent of the build, so run it in the background
+# while Docker builds (the longest step) and only wait for it before pushing
 echo ""
 echo "[2/4] Building Docker image..."
+aws ecr get-login-password --region ${AWS_REGION} | docker login --username AWS --password-stdin ${ECR_URL} &
+ECR_LOGIN_PID=$!
 docker build -t ${REPOSITORY_NAME}:${IMAGE_TAG} .
 
-# Step 3: Login to ECR and push image
+# Step 3: Push image to ECR
 echo ""
 echo "[3/4] Pushing image to ECR..."
-aws ecr get-login-password --region ${AWS_REGION} | docker login --username AWS --password-stdin ${ECR_URL}
+wait ${ECR_LOGIN_PID}
 docker tag ${REPOSITORY_NAME}:${IMAGE_TAG} ${ECR_URL}:${IMAGE_TAG}
 docker push ${ECR_URL}:${IMAGE_TAG}
 
@@ -52,7 +56,11 @@ echo "Waiting for deployment to complete..."
 SERVICE_ARN=$(aws apprunner list-services --region ${AWS_REGION} --query "ServiceSummaryList[?ServiceName=='sap-agent-ui-${ENVIRONMENT}'].ServiceArn" --output text)
 
 # Wait for service to be running
+# Poll with exponential backoff (2s, 3s, 4s, 6s, ... capped at 30s) so short
+# transitions are noticed quickly without hammering the API on long deploys
 echo "Monitoring deployment status..."
+POLL_DELAY=2
+MAX_POLL_DELAY=30
 while true; do
     STATUS=$(aws apprunner describe-service --service-arn ${SERVICE_ARN} --region ${AWS_REGION} --query 'Service.Status' --output text)
     echo "Status: ${STATUS}"
@@ -60,8 +68,12 @@ while true; do
     if [ "${STATUS}" == "RUNNING" ]; then
         break
     elif [ "${STATUS}" == "OPERATION_IN_PROGRESS" ]; then
-        echo "Deployment in progress..."
-        sleep 10
+        echo "Deployment in progress... (next check in ${POLL_DELAY}s)"
+        sleep ${POLL_DELAY}
+        POLL_DELAY=$(( POLL_DELAY * 3 / 2 ))
+        if [ ${POLL_DELAY} -gt ${MAX_POLL_DELAY} ]; then
+            POLL_DELAY=${MAX_POLL_DELAY}
+        fi
     else
         echo "Unexpected status: ${STATUS}"
         exit 1
@@ -3,6 +3,8 @@ data "archive_file" "lambda_zip" {
   type        = "zip"
   source_dir  = "${path.module}/../lambda_functions"
   output_path = "${path.module}/lambda_package.zip"
+  # Local dev packaging (pip install -e lambda_functions), not Lambda code
+  excludes    = ["pyproject.toml", "sap_tools.egg-info", "build"]
 }
 
 # Lambda Layer for dependencies (requests, etc.)
@@ -0,0 +1,44 @@
+"""
+Shared AWS clients for the agent test scripts
+
+Creating a boto3 client loads its service model and builds a connection pool,
+so the scripts import one module-level client from here instead of each
+constructing their own (boto3 clients are thread-safe).
+"""
+import json
+import os
+
+import boto3
+from botocore.config import Config
+
+REGION = "us-east-1"
+ACCOUNT_ID = os.getenv("AGENT_ACCOUNT_ID", "654537381132")
+
+# Generous read timeout for agent turns that call several tools; the larger
+# pool lets concurrent invocations each hold a keep-alive connection
+CLIENT_CONFIG = Config(
+    connect_timeout=5,
+    read_timeout=60,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    max_pool_connections=32,
+    tcp_keepalive=True,
+)
+
+SESSION = boto3.Session()
+AGENTCORE = SESSION.client('bedrock-agentcore', region_name=REGION, config=CLIENT_CONFIG)
+
+
+def runtime_arn(agent_id):
+    """AgentCore runtime ARN for an agent id in the test account"""
+    return f"arn:aws:bedrock-agentcore:{REGION}:{ACCOUNT_ID}:runtime/{agent_id}"
+
+
+# orjson returns the UTF-8 bytes the payload needs directly
+try:
+    import orjson
+
+    def encode_prompt(prompt):
+        return orjson.dumps({"prompt": prompt})
+except ImportError:
+    def encode_prompt(prompt):
+        return json.dumps({"prompt": prompt}).encode('utf-8')
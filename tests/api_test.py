@@ -2,14 +2,46 @@
 """
 Quick test of the deployed agent with inventory management questions
 """
-import boto3
+import asyncio
 import json
+import os
 import uuid
-import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _clients import AGENTCORE, encode_prompt, runtime_arn
 
 # Agent configuration
 AGENT_ID = "strands_s3_hebinv_TST-5534QT9g4p"
-REGION = "us-east-1"
+AGENT_ARN = runtime_arn(AGENT_ID)
+
+# Invocations started per second across concurrent questions (rate-limit budget)
+AGENT_RPS = float(os.getenv("AGENT_RPS", "4"))
+
+
+class _TokenBucket:
+    """Async token bucket: bursts up to `rate` calls, refilled at `rate` per second"""
+
+    def __init__(self, rate):
+        self._rate = rate
+        self._tokens = rate
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self._rate, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    async def __aexit__(self, *exc):
+        return False
 
 def test_inventory_questions():
     """Test agent with inventory management questions"""
@@ -18,8 +50,7 @@ def test_inventory_questions():
     print("=" * 80)
     print()
 
-    client = boto3.client('bedrock-agentcore', region_name=REGION)
-    session_id = f'inventory-test-{uuid.uuid4()}'
+    client = AGENTCORE
 
     # Test questions focused on inventory management
     test_questions = [
@@ -45,47 +76,60 @@ def test_inventory_questions():
         }
     ]
 
-    for i, test in enumerate(test_questions, 1):
+    def _invoke(session_id, question):
+        """Blocking invoke + read of one question (runs in a worker thread)"""
+        response = client.invoke_agent_runtime(
+            agentRuntimeArn=AGENT_ARN,
+            runtimeSessionId=session_id,
+            payload=encode_prompt(question)
+        )
+        if 'response' in response:
+            return response['response'].read().decode('utf-8')
+        return None
+
+    async def _run_all():
+        # boto3 has no async API: overlap the blocking calls in one thread per
+        # question, each in its own session so concurrent runs don't collide
+        loop = asyncio.get_running_loop()
+        limiter = _TokenBucket(AGENT_RPS)
+
+        async def _ask(pool, question):
+            async with limiter:
+                return await loop.run_in_executor(pool, _invoke, f'inventory-test-{uuid.uuid4()}', question)
+
+        with ThreadPoolExecutor(max_workers=len(test_questions)) as pool:
+            return await asyncio.gather(*[
+                _ask(pool, test['question']) for test in test_questions
+            ], return_exceptions=True)
+
+    print(f"   🚀 Invoking agent with {len(test_questions)} questions concurrently...")
+    outcomes = asyncio.run(_run_all())
+
+    # Report in question order once everything has come back
+    for i, (test, outcome) in enumerate(zip(test_questions, outcomes), 1):
         print(f"\n📝 Test {i}/{len(test_questions)}: {test['description']}")
         print(f"   Question: {test['question']}")
         print(f"   Expected tool: {test['expected_tool']}")
         print("-" * 80)
 
-        try:
-            # Invoke the agent
-            print(f"   🚀 Invoking agent...")
-            response = client.invoke_agent_runtime(
-                agentRuntimeArn=f"arn:aws:bedrock-agentcore:{REGION}:654537381132:runtime/{AGENT_ID}",
-                runtimeSessionId=session_id,
-                payload=json.dumps({
-                    "prompt": test['question']
-                }).encode('utf-8')
-            )
-
-            # Read response
-            if 'response' in response:
-                response_body = response['response']
-                response_text = response_body.read().decode('utf-8')
-
-                try:
-                    response_data = json.loads(response_text)
-
-                    # Pretty print the response
-                    print(f"\n   📄 Response:")
-                    print(json.dumps(response_data, indent=2, ensure_ascii=False))
-
-                except json.JSONDecodeError:
-                    print(f"\n   📄 Response (plain text):")
-                    print(f"   {response_text}")
-
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
+        if isinstance(outcome, Exception):
+            print(f"   ❌ Error: {outcome}")
             import traceback
-            traceback.print_exc()
+            traceback.print_exception(outcome)
+        elif outcome is not None:
+            response_text = outcome
+            try:
+                response_data = json.loads(response_text)
+
+                # Pretty print the response
+                print(f"\n   📄 Response:")
+                print(json.dumps(response_data, indent=2, ensure_ascii=False))
+
+            except json.JSONDecodeError:
+                print(f"\n   📄 Response (plain text):")
+                print(f"   {response_text}")
 
         print()
-        # Brief pause between requests
-        time.sleep(2)
 
     print("=" * 80)
     print("✅ Testing complete")
@@ -1,18 +1,19 @@
 #!/usr/bin/env python3
 """Test get_open_purchase_orders directly"""
+import importlib.util
 import json
 import os
 import sys
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 try:
     from dotenv import load_dotenv
     load_dotenv()
 except Exception:
     pass
 
-sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_functions'))
+# Importable once installed (pip install -e lambda_functions); else use the source tree
+if importlib.util.find_spec("sap_tools") is None:
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_functions'))
 from sap_tools import get_open_purchase_orders
 
 print("Testing get_open_purchase_orders directly...\n")
@@ -9,14 +9,139 @@ This script tests the complete flow to ensure:
 4. Lambda retrieves REAL SAP data (not mock)
 5. Agent responds with actual SAP purchase order details
 """
-import boto3
 import json
 import uuid
 import sys
 
+from _clients import AGENTCORE, encode_prompt, runtime_arn
+
+# ijson (optional) parses the agent's reply while it is still streaming in
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Agent configuration
 AGENT_ID = "strands_s3_hebinv_TST-AOSMpkAeu5"
-REGION = "us-east-1"
+AGENT_ARN = runtime_arn(AGENT_ID)
+
+# Top-level reply fields the test reads; everything else is skipped unparsed
+_CONTENT_FIELDS = ("output", "response", "message")
+_WANTED_FIELDS = _CONTENT_FIELDS + ("toolCalls",)
+_PEEK_BYTES = 1024
+
+
+class _ReplayReader:
+    """File-like view of the body that first replays the peeked bytes and counts what was read"""
+
+    def __init__(self, head, body):
+        self._head = head
+        self._body = body
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        if size == 0:  # ijson probes the stream type with read(0)
+            return b""
+        if self._head:
+            chunk, self._head = self._head, b""
+        else:
+            chunk = self._body.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def _collect_keywords(value, keywords, seen):
+    if isinstance(value, str):
+        seen.update(k for k in keywords if k in value)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _collect_keywords(v, keywords, seen)
+    elif isinstance(value, list):
+        for v in value:
+            _collect_keywords(v, keywords, seen)
+
+
+def _stream_fields(reader, keywords, seen, fields):
+    """
+    Pull the wanted top-level fields of a JSON object into `fields` as it streams in.
+
+    Keywords are checked on every string value as soon as it is parsed. Stops
+    reading once a content field and toolCalls are both in hand. Other
+    top-level keys are listed with value None (their values are not kept).
+    Returns True when it stopped early.
+    """
+    depth = 0
+    capture = None  # (key, builder) while inside a wanted top-level value
+    for _, event, value in ijson.parse(reader):
+        if event == 'string':
+            seen.update(k for k in keywords if k in value)
+        if depth == 1 and event == 'map_key':
+            fields[value] = None
+            capture = (value, ijson.ObjectBuilder()) if value in _WANTED_FIELDS else None
+            continue
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+        if capture is not None:
+            key, builder = capture
+            builder.event(event, value)
+            if depth == 1:
+                fields[key] = builder.value
+                capture = None
+                if "toolCalls" in fields and any(fields.get(k) is not None for k in _CONTENT_FIELDS):
+                    return True
+    return False
+
+
+def _read_agent_response(body, keywords):
+    """
+    Parse the agent's reply from its StreamingBody.
+
+    A JSON object reply is parsed with ijson while it streams, keeping only
+    the fields the test reads, so the body is never buffered whole. Anything
+    else (plain text, a bare JSON value, or no ijson installed) is read in
+    full and parsed as before.
+
+    Returns (response_data, response_text, seen_keywords, bytes_read);
+    response_text is None when the reply was streamed, and response_data is
+    None when the reply is not JSON. Raises ValueError when a streamed reply
+    breaks before any field could be parsed.
+    """
+    seen = set()
+    head = b""
+    while True:
+        chunk = body.read(_PEEK_BYTES)
+        head += chunk
+        if not chunk or head.lstrip():
+            break
+
+    if ijson is not None and head.lstrip()[:1] == b"{":
+        reader = _ReplayReader(head, body)
+        fields = {}
+        try:
+            stopped_early = _stream_fields(reader, keywords, seen, fields)
+        except ijson.JSONError as e:
+            # Malformed mid-stream: the consumed bytes are gone, so keep what was
+            # parsed, or fail the test when nothing usable came through
+            if all(fields.get(k) is None for k in _WANTED_FIELDS):
+                raise ValueError(f"Malformed agent reply after {reader.bytes_read} bytes: {e}") from e
+            print(f"   ⚠️  Reply stopped parsing after {reader.bytes_read} bytes: {e}")
+            stopped_early = False
+        if stopped_early:
+            body.close()
+        return fields or None, None, seen, reader.bytes_read
+
+    raw = head + body.read()
+    response_text = raw.decode('utf-8')
+    try:
+        response_data = json.loads(response_text)
+        _collect_keywords(response_data, keywords, seen)
+    except json.JSONDecodeError:
+        response_data = None
+        seen.update(k for k in keywords if k in response_text)
+    return response_data, response_text, seen, len(raw)
+
 
 def test_agent_e2e():
     """Test the complete end-to-end flow"""
@@ -28,7 +153,7 @@ def test_agent_e2e():
 
     # Initialize Bedrock AgentCore client
     print(f"📡 Connecting to agent: {AGENT_ID}")
-    client = boto3.client('bedrock-agentcore', region_name=REGION)
+    client = AGENTCORE
     session_id = f'e2e-test-{uuid.uuid4()}'
     print(f"   Session ID: {session_id}")
     print()
@@ -58,11 +183,9 @@ def test_agent_e2e():
             # Invoke the agent
             print(f"   🚀 Invoking agent...")
             response = client.invoke_agent_runtime(
-                agentRuntimeArn=f"arn:aws:bedrock-agentcore:{REGION}:654537381132:runtime/{AGENT_ID}",
+                agentRuntimeArn=AGENT_ARN,
                 runtimeSessionId=session_id,
-                payload=json.dumps({
-                    "prompt": test['question']
-                }).encode('utf-8')
+                payload=encode_prompt(test['question'])
             )
 
             print(f"   📥 Response received. Keys: {list(response.keys())}")
@@ -74,35 +197,35 @@ def test_agent_e2e():
             # Read from the 'response' StreamingBody
             if 'response' in response:
                 print(f"   📡 Reading response stream...")
-                response_body = response['response']
-                response_text = response_body.read().decode('utf-8')
-                print(f"   📄 Response text ({len(response_text)} chars)")
+                response_data, response_text, seen_keywords, bytes_read = _read_agent_response(
+                    response['response'], test['expected_keywords'])
+                print(f"   📄 Response read ({bytes_read} bytes)")
+                print(f"   🔎 Expected keywords seen: {len(seen_keywords)}/{len(test['expected_keywords'])} "
+                      f"{sorted(seen_keywords)}")
 
                 # Parse JSON response
-                try:
-                    response_data = json.loads(response_text)
-
+                if response_data is not None:
                     # Check if it's a dict or string
                     if isinstance(response_data, dict):
                         print(f"   📦 Parsed JSON dict with keys: {list(response_data.keys())}")
 
                         # Extract the actual response content
-                        if 'output' in response_data:
+                        if response_data.get('output') is not None:
                             full_response = response_data['output']
                             print(f"   ✅ Found output field")
-                        elif 'response' in response_data:
+                        elif response_data.get('response') is not None:
                             full_response = response_data['response']
                             print(f"   ✅ Found response field")
-                        elif 'message' in response_data:
+                        elif response_data.get('message') is not None:
                             full_response = response_data['message']
                             print(f"   ✅ Found message field")
                         else:
-                            # Fallback to raw response
-                            full_response = response_text
+                            # Fallback to raw response (not kept when it was streamed)
+                            full_response = response_text or str(response_data)
                             print(f"   ⚠️  Using raw response")
 
                         # Check for tool usage information
-                        if 'toolCalls' in response_data:
+                        if response_data.get('toolCalls') is not None:
                             tool_calls = response_data['toolCalls']
                             print(f"   🔧 Found {len(tool_calls)} tool calls")
                     elif isinstance(response_data, str):
@@ -113,8 +236,8 @@ def test_agent_e2e():
                         full_response = str(response_data)
                         print(f"   ⚠️  Converted to string: {type(response_data)}")
 
-                except json.JSONDecodeError as e:
-                    print(f"   ⚠️  JSON decode error: {e}")
+                else:
+                    print(f"   ⚠️  Response is not JSON")
                     # Response is plain text, not JSON
                     full_response = response_text
                     print(f"   ✅ Using plain text response")
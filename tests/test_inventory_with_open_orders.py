@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Offline test of get_inventory_with_open_orders
+
+SAP is replaced by canned OData responses, so this checks the stock/open-order
+join itself (no SAP credentials or network needed).
+"""
+import importlib.util
+import json
+import os
+import sys
+
+# Placeholder credentials so sap_tools doesn't look them up in Secrets Manager
+for _var in ("SAP_HOST", "SAP_USER", "SAP_PASSWORD"):
+    os.environ.setdefault(_var, "stub")
+
+# Importable once installed (pip install -e lambda_functions); else use the source tree
+if importlib.util.find_spec("sap_tools") is None:
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_functions'))
+import sap_tools
+
+STOCK = [
+    {"Material": "MZ-FG-C900", "Plant": "1010", "StorageLocation": "101A",
+     "MatlWrhsStkQtyInMatlBaseUnit": "42.000", "MaterialBaseUnit": "EA"},
+    {"Material": "MZ-RM-R300", "Plant": "1010", "StorageLocation": "101A",
+     "MatlWrhsStkQtyInMatlBaseUnit": "5.000", "MaterialBaseUnit": "EA"},
+]
+PO_HEADERS = [
+    {"PurchaseOrder": "4500000520", "Supplier": "USSU-VSF08", "PurchasingOrganization": "1710"},
+]
+PO_ITEMS = {
+    "4500000520": [
+        {"PurchaseOrder": "4500000520", "PurchaseOrderItem": "10", "Material": "MZ-FG-C900",
+         "OrderQuantity": "7.000", "PurchaseOrderQuantityUnit": "EA"},
+        {"PurchaseOrder": "4500000520", "PurchaseOrderItem": "20", "Material": "NOT-IN-STOCK",
+         "OrderQuantity": "3.000", "PurchaseOrderQuantityUnit": "EA"},
+    ],
+}
+
+
+def _odata(entries):
+    return {"status": "success", "data": json.dumps({"d": {"results": entries}})}
+
+
+class StubSAP:
+    """Stands in for sap_tools.make_sap_request and records the URLs it served"""
+
+    def __init__(self, stock=STOCK, headers=PO_HEADERS, items=PO_ITEMS):
+        self.stock, self.headers, self.items = stock, headers, items
+        self.urls = []
+
+    def __call__(self, url, timeout=30, retries=3, cache=True):
+        self.urls.append(url)
+        if "A_MatlStkInAcctMod" in url:
+            return _odata(self.stock)
+        if "I_PurchaseOrderItem" in url:
+            return _odata(next((v for k, v in self.items.items() if k in url), []))
+        if "I_PurchaseOrder" in url:
+            return _odata(self.headers)
+        return {"status": "error", "message": f"unexpected URL {url}"}
+
+    def item_queries(self):
+        return sum("I_PurchaseOrderItem" in url for url in self.urls)
+
+
+def run_with(stub):
+    original = sap_tools.make_sap_request
+    sap_tools.make_sap_request = stub
+    try:
+        return sap_tools.get_inventory_with_open_orders()
+    finally:
+        sap_tools.make_sap_request = original
+
+
+def test_material_matched_to_open_order():
+    stub = StubSAP()
+    result = run_with(stub)
+
+    assert result["status"] == "success", result
+    assert result["total_materials"] == 1, result
+    match = result["inventory_with_open_orders"][0]
+    assert match["material"] == "MZ-FG-C900"
+    assert match["available_quantity"] == 42.0
+    assert match["total_open_quantity"] == 7.0
+    assert match["open_orders"][0]["purchase_order"] == "4500000520"
+    assert match["open_orders"][0]["supplier"] == "USSU-VSF08"
+    assert stub.item_queries() == 1
+
+
+def test_open_orders_without_stock_match_still_probe_items():
+    # Orders exist but none is for a stocked material: items are fetched, nothing matches
+    stub = StubSAP(stock=STOCK[1:])
+    result = run_with(stub)
+
+    assert result["status"] == "success", result
+    assert result["total_materials"] == 0, result
+    assert stub.item_queries() == 1
+
+
+def test_no_open_orders_skips_item_queries():
+    stub = StubSAP(headers=[])
+    result = run_with(stub)
+
+    assert result["status"] == "success", result
+    assert result["inventory_with_open_orders"] == []
+    assert stub.item_queries() == 0
+
+
+def test_no_stock_skips_item_queries():
+    stub = StubSAP(stock=[])
+    result = run_with(stub)
+
+    assert result["status"] == "success", result
+    assert result["inventory_with_open_orders"] == []
+    assert stub.item_queries() == 0
+
+
+TESTS = [
+    test_material_matched_to_open_order,
+    test_open_orders_without_stock_match_still_probe_items,
+    test_no_open_orders_skips_item_queries,
+    test_no_stock_skips_item_queries,
+]
+
+
+def main():
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\nResults: {len(TESTS) - failed}/{len(TESTS)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Offline test of the $inlinecount totals in get_orders_awaiting_invoice_or_delivery
+
+SAP is replaced by canned OData responses, so this checks when the tool falls
+back from count queries to the 300-row sample (no SAP credentials or network
+needed).
+"""
+import importlib.util
+import json
+import os
+import sys
+
+# Placeholder credentials so sap_tools doesn't look them up in Secrets Manager
+for _var in ("SAP_HOST", "SAP_USER", "SAP_PASSWORD"):
+    os.environ.setdefault(_var, "stub")
+
+# Importable once installed (pip install -e lambda_functions); else use the source tree
+if importlib.util.find_spec("sap_tools") is None:
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_functions'))
+import sap_tools
+
+# Totals served by the count queries, in _AWAITING_COUNT_FILTERS order
+COUNTS = (1200, 40, 25, 15)
+ITEMS = [
+    {"PurchaseOrder": "4500000520", "PurchaseOrderItem": "10", "Material": "MZ-FG-C900",
+     "OrderQuantity": "7.000", "PurchaseOrderQuantityUnit": "EA",
+     "IsCompletelyDelivered": False, "IsFinallyInvoiced": False},
+    {"PurchaseOrder": "4500000521", "PurchaseOrderItem": "10", "Material": "MZ-RM-R300",
+     "OrderQuantity": "3.000", "PurchaseOrderQuantityUnit": "EA",
+     "IsCompletelyDelivered": True, "IsFinallyInvoiced": False},
+]
+
+
+class StubSAP:
+    """Stands in for sap_tools.make_sap_request; count query number `fail_count` errors once"""
+
+    def __init__(self, fail_count=None, failure="HTTP Error 503: Service Unavailable"):
+        self.fail_count = fail_count
+        self.failure = failure
+        self.urls = []
+
+    def __call__(self, url, timeout=30, retries=3, cache=True):
+        self.urls.append(url)
+        if "inlinecount" in url:
+            index = [sap_tools._count_url(f) for f in sap_tools._AWAITING_COUNT_FILTERS].index(url)
+            if index == self.fail_count:
+                self.fail_count = None
+                return {"status": "error", "message": self.failure}
+            body = {"d": {"results": [], "__count": str(COUNTS[index])}}
+        else:
+            body = {"d": {"results": ITEMS}}
+        return {"status": "success", "data": json.dumps(body)}
+
+    def count_queries(self):
+        return sum("inlinecount" in url for url in self.urls)
+
+
+def run_with(stub):
+    original = sap_tools.make_sap_request
+    sap_tools.make_sap_request = stub
+    try:
+        return sap_tools.get_orders_awaiting_invoice_or_delivery()
+    finally:
+        sap_tools.make_sap_request = original
+
+
+def reset():
+    sap_tools._SERVER_FILTER_SUPPORTED.pop("inlinecount", None)
+
+
+def test_totals_from_counts():
+    reset()
+    stub = StubSAP()
+    result = run_with(stub)
+
+    assert result["status"] == "success", result
+    assert result["total_items_in_system"] == COUNTS[0], result
+    assert stub.count_queries() == 4
+
+
+def test_transient_count_failure_keeps_counts_for_next_call():
+    reset()
+    stub = StubSAP(fail_count=1)
+    result = run_with(stub)
+
+    # This call falls back to the sample...
+    assert result["status"] == "success", result
+    assert result["total_items_in_system"] == len(ITEMS), result
+    assert sap_tools._SERVER_FILTER_SUPPORTED.get("inlinecount", True)
+
+    # ...and the next one goes back to the count queries
+    stub.urls.clear()
+    result = run_with(stub)
+    assert result["total_items_in_system"] == COUNTS[0], result
+    assert stub.count_queries() == 4
+
+
+def test_rejected_count_query_disables_counts():
+    reset()
+    stub = StubSAP(fail_count=1, failure="HTTP Error 400: Bad Request")
+    result = run_with(stub)
+
+    assert result["total_items_in_system"] == len(ITEMS), result
+    assert sap_tools._SERVER_FILTER_SUPPORTED["inlinecount"] is False
+
+    stub.urls.clear()
+    run_with(stub)
+    assert stub.count_queries() == 0
+    reset()
+
+
+TESTS = [
+    test_totals_from_counts,
+    test_transient_count_failure_keeps_counts_for_next_call,
+    test_rejected_count_query_disables_counts,
+]
+
+
+def main():
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\nResults: {len(TESTS) - failed}/{len(TESTS)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import boto3
 import sys
 import os
 from boto3.session import Session
+from botocore.config import Config
 
 # Only import Runtime if needed (not for web UI)
 try:
@@ -30,6 +31,22 @@ except ImportError:
 boto_session = Session()
 region = boto_session.region_name
 
+# Adaptive retry mode lets botocore back off client-side when the runtime
+# throttles. The rate limiter state lives on the client, so a single client
+# is shared by every invoke_agent call (boto3 clients are thread-safe).
+AGENT_CORE_CLIENT_CONFIG = Config(retries={'mode': 'adaptive', 'max_attempts': 5})
+_agent_core_client = None
+
+
+def _get_agent_core_client():
+    """Return the shared bedrock-agentcore data-plane client."""
+    global _agent_core_client
+    if _agent_core_client is None:
+        _agent_core_client = boto3.client(
+            'bedrock-agentcore', region_name=region, config=AGENT_CORE_CLIENT_CONFIG
+        )
+    return _agent_core_client
+
 
 class ExistingAgentLaunchResult:
     """Mock launch result object for already-deployed agents to maintain API compatibility."""
@@ -210,9 +227,8 @@ def invoke_agent(agent_arn, prompt, session_id=None):
     import uuid
     
     try:
-        # Initialize the Bedrock AgentCore client
-        agent_core_client = boto3.client('bedrock-agentcore', region_name=region)
-        
+        # Reuse the shared Bedrock AgentCore client (adaptive retries)
+        agent_core_client = _get_agent_core_client()
 
         # Try to get Langfuse context, but don't fail if unavailable
         trace_id = None
@@ -243,6 +259,11 @@ def invoke_agent(agent_arn, prompt, session_id=None):
             runtimeSessionId=session_id,
             payload=payload
         )
+
+        # Surface throttling: a non-zero count means the worker ceiling is too high
+        retry_attempts = response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        if retry_attempts:
+            print(f"Warning: invoke_agent_runtime needed {retry_attempts} retries (session {session_id})")
         
         # Process the response based on content type
         content_type = response.get("contentType", "")
@@ -2,6 +2,7 @@ import base64
 import os
 import sys
 import importlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Avoid circular import by importing langfuse differently
@@ -15,6 +16,9 @@ except (ImportError, AttributeError):
 
 from utils.aws import get_ssm_parameter
 
+# Langfuse settings stored in SSM under /langfuse/<KEY>
+LANGFUSE_SSM_KEYS = ("LANGFUSE_HOST", "LANGFUSE_SECRET_KEY", "LANGFUSE_PUBLIC_KEY", "LANGFUSE_PROJECT_NAME")
+
 
 def get_langfuse_client():
     """
@@ -24,10 +28,11 @@ def get_langfuse_client():
     - Langfuse client instance
     """
 
-    os.environ["LANGFUSE_HOST"] = get_ssm_parameter("/langfuse/LANGFUSE_HOST")
-    os.environ["LANGFUSE_SECRET_KEY"] = get_ssm_parameter("/langfuse/LANGFUSE_SECRET_KEY")
-    os.environ["LANGFUSE_PUBLIC_KEY"] = get_ssm_parameter("/langfuse/LANGFUSE_PUBLIC_KEY")
-    os.environ["LANGFUSE_PROJECT_NAME"] = get_ssm_parameter("/langfuse/LANGFUSE_PROJECT_NAME")
+    # The four SSM lookups are independent round-trips; fetch them concurrently
+    with ThreadPoolExecutor(max_workers=len(LANGFUSE_SSM_KEYS)) as pool:
+        values = pool.map(lambda key: get_ssm_parameter(f"/langfuse/{key}"), LANGFUSE_SSM_KEYS)
+        for key, value in zip(LANGFUSE_SSM_KEYS, values):
+            os.environ[key] = value
     # Initialize Langfuse client
     client = get_client()
     